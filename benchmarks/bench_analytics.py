@@ -0,0 +1,76 @@
+"""
+Query time of the analytics endpoints over a year of requisitions, cold
+(aggregation runs) and warm (served from the cache).
+
+    python -m benchmarks.bench_analytics --rows 1000000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks.utils import scratch_database, seed_requisitions, spread_requisition_dates, timer
+
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.db.models.lookups import Exact
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core.models import Requisition
+from core.views import ANALYTICS_METRICS, analytics_data
+
+
+def add_loan_dates(buckets=8):
+    """
+    Gives the seeded approved / returned requisitions approval, due and
+    return dates, varied by id so turnaround and lateness are not uniform.
+    """
+    loans = Requisition.objects.filter(status__in=['APPROVED', 'RETURNED'])
+    for bucket in range(buckets):
+        loans.filter(Exact(Mod('id', buckets), bucket)).update(
+            approve_date=F('date') + timedelta(hours=bucket + 1),
+            return_date=F('date') + timedelta(days=3),
+        )
+        loans.filter(status='RETURNED').filter(Exact(Mod('id', buckets), bucket)).update(
+            actual_return_date=F('date') + timedelta(days=bucket, hours=5),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    with scratch_database():
+        with timer(f'seed {args.rows} requisitions over {args.days} days'):
+            staff = seed_requisitions(args.rows)
+            spread_requisition_dates(args.days)
+            add_loan_dates()
+
+        factory = RequestFactory()
+        today = timezone.localdate()
+        ranges = {
+            'default range': {},
+            f'{args.days} days': {'start_date': (today - timedelta(days=args.days)).isoformat()},
+        }
+        for label, params in ranges.items():
+            print(label)
+            for metric in ANALYTICS_METRICS:
+                request = factory.get(f'/analytics/{metric}.json', params)
+                request.user = staff
+                cache.clear()
+                timings = []
+                for _ in range(2):
+                    start = time.perf_counter()
+                    response = analytics_data(request, metric)
+                    timings.append(time.perf_counter() - start)
+                print(
+                    f'{metric:>14}: cold {timings[0] * 1000:9.1f} ms  warm {timings[1] * 1000:6.2f} ms  '
+                    f'{len(response.content) / 1024:6.1f} KB'
+                )
+
+
+if __name__ == '__main__':
+    main()
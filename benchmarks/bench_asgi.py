@@ -0,0 +1,183 @@
+"""
+Concurrent throughput and p99 latency of the read-heavy views
+(search_equipment, dashboard, my_requests) deployed over WSGI versus ASGI,
+with the same number of workers.
+
+WSGI models gunicorn sync workers: each worker serves one request at a
+time. ASGI models one event loop per worker (e.g. gunicorn with
+uvicorn.workers.UvicornWorker), serving every open request at once while
+the async views wait on the database. Both run in this process against the
+real WSGIHandler / ASGIHandler; --db-latency adds a sleep to every query to
+stand in for the round trip to a remote PostgreSQL server. The cache is
+disabled so every request reaches the database.
+
+    python -m benchmarks.bench_asgi --workers 4 --clients 64 --requests 2000 --db-latency 5
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+from benchmarks.utils import scratch_database, seed_requisitions
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncRequestFactory, Client, RequestFactory, override_settings
+from django.urls import reverse
+
+SEARCH_TERMS = ['e', 'eq', 'equ', 'equip', 'equipment 1', 'equipment 12', 'category', 'category 3', 'bench', 'xyz']
+
+
+def add_db_latency(seconds):
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        # Fires on every reconnect of the same wrapper, so only add it once
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    if connection.connection is not None:
+        install(connection)
+
+
+def request_paths():
+    paths = [(reverse('search_equipment'), {'q': term}) for term in SEARCH_TERMS]
+    paths += [(reverse('dashboard'), {}), (reverse('my_requests'), {})]
+    return paths
+
+
+def report(label, latencies, elapsed):
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(
+        f'{label:>5}: {len(latencies) / elapsed:8.1f} req/s  '
+        f'median {statistics.median(latencies) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms'
+    )
+
+
+def run_wsgi(session_key, workers, clients, requests):
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    factory.cookies['sessionid'] = session_key
+    paths = cycle(request_paths())
+    lock = threading.Lock()
+    remaining = [requests]
+    latencies = []
+
+    def serve(path, data):
+        environ = factory.get(path, data).environ
+        status = []
+        body = b''.join(handler(environ, lambda s, headers, exc_info=None: status.append(s)))
+        assert status[0].startswith('200'), (path, status[0], body[:200])
+
+    def client(pool):
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+                path, data = next(paths)
+            start = time.perf_counter()
+            pool.submit(serve, path, data).result()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        threads = [threading.Thread(target=client, args=(pool,)) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    report('WSGI', latencies, time.perf_counter() - start)
+
+
+def run_asgi(session_key, workers, clients, requests):
+    factory = AsyncRequestFactory()
+    factory.cookies['sessionid'] = session_key
+    paths = cycle(request_paths())
+    lock = threading.Lock()
+    remaining = [requests]
+    latencies = []
+
+    async def serve(handler, path, data):
+        scope = factory.get(path, data).scope
+        messages = []
+        received = []
+
+        async def receive():
+            if received:
+                # Nothing more to read; the handler cancels this wait when it is done
+                await asyncio.Future()
+            received.append(True)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await handler(scope, receive, send)
+        assert messages[0]['status'] == 200, (path, messages[0]['status'])
+
+    async def client(handler):
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+                path, data = next(paths)
+            start = time.perf_counter()
+            await serve(handler, path, data)
+            latencies.append(time.perf_counter() - start)
+
+    async def worker(clients):
+        handler = ASGIHandler()
+        await asyncio.gather(*(client(handler) for _ in range(clients)))
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=asyncio.run, args=(worker(clients // workers + (i < clients % workers)),))
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report('ASGI', latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--db-latency', type=float, default=5, help='milliseconds added to every query')
+    args = parser.parse_args()
+
+    with scratch_database(), override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    ):
+        seed_requisitions(20_000, equipment=2000)
+        user = User.objects.get(username='bench-user-0')
+        client = Client()
+        client.force_login(user)
+        session_key = client.cookies['sessionid'].value
+
+        add_db_latency(args.db_latency / 1000)
+        print(
+            f'{args.workers} workers, {args.clients} concurrent clients, {args.requests} requests, '
+            f'{args.db_latency:g} ms per query'
+        )
+        run_wsgi(session_key, args.workers, args.clients, args.requests)
+        run_asgi(session_key, args.workers, args.clients, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Per-request database connection overhead: a new connection for every
+request (CONN_MAX_AGE=0, the old configuration) versus persistent
+connections with health checks and, on PostgreSQL with psycopg 3, the
+connection pool configured in settings.
+
+Requests go through the real WSGIHandler, so connections are opened and
+closed by Django's request_started / request_finished handlers exactly as
+under gunicorn. On SQLite a connect is local and nearly free;
+--connect-latency adds a sleep to every new connection to stand in for the
+TCP + auth handshake to the remote PostgreSQL server.
+
+    python -m benchmarks.bench_connections --requests 500 --connect-latency 20
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.utils import scratch_database, seed_requisitions
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from core.dbpool import connection_mode
+
+
+def add_connect_latency(seconds, opened):
+    get_new_connection = connection.get_new_connection
+
+    def slow_get_new_connection(conn_params):
+        opened.append(1)
+        time.sleep(seconds)
+        return get_new_connection(conn_params)
+
+    connection.get_new_connection = slow_get_new_connection
+
+
+def configure(mode, pool_size):
+    connection.close()
+    if connection.vendor == 'postgresql':
+        connection.close_pool()
+    connection.settings_dict['OPTIONS'].pop('pool', None)
+    connection.settings_dict['CONN_HEALTH_CHECKS'] = mode != 'per-request'
+    connection.settings_dict['CONN_MAX_AGE'] = 60 if mode == 'persistent' else 0
+    if mode == 'pool':
+        connection.settings_dict['OPTIONS']['pool'] = {'min_size': 1, 'max_size': pool_size}
+
+
+def run(mode, session_key, requests, pool_size, opened):
+    configure(mode, pool_size)
+    assert connection_mode(connection) == mode
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    factory.cookies['sessionid'] = session_key
+    url = reverse('equipment_data')
+
+    del opened[:]
+    latencies = []
+    for i in range(requests):
+        environ = factory.get(url, {'page': i % 5 + 1}).environ
+        status = []
+        start = time.perf_counter()
+        b''.join(handler(environ, lambda s, headers, exc_info=None: status.append(s)))
+        latencies.append(time.perf_counter() - start)
+        assert status[0].startswith('200'), status[0]
+
+    connects = connection.pool.get_stats().get('connections_num', 0) if mode == 'pool' else len(opened)
+    latencies.sort()
+    print(
+        f'{mode:>12}: {connects:5d} connects  '
+        f'mean {statistics.mean(latencies) * 1000:6.2f} ms  '
+        f'median {statistics.median(latencies) * 1000:6.2f} ms  '
+        f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:6.2f} ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument(
+        '--connect-latency', type=float, default=None,
+        help='milliseconds added to every new connection (default 20 on SQLite, 0 otherwise)',
+    )
+    args = parser.parse_args()
+
+    with scratch_database():
+        staff = seed_requisitions(1000, equipment=200)
+        client = Client()
+        client.force_login(staff)
+        session_key = client.cookies['sessionid'].value
+
+        latency = args.connect_latency
+        if latency is None:
+            latency = 20 if connection.vendor == 'sqlite' else 0
+        opened = []
+        add_connect_latency(latency / 1000, opened)
+        print(f'backend: {connection.vendor}, {args.requests} requests, {latency:g} ms per connect')
+
+        modes = ['per-request', 'persistent']
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            pass
+        else:
+            if connection.vendor == 'postgresql':
+                modes.append('pool')
+        for mode in modes:
+            run(mode, session_key, args.requests, args.pool_size, opened)
+        configure('per-request', args.pool_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Peak RSS and time-to-first-byte of the request_report CSV export.
+
+Compares the streaming export against the previous implementation, which
+built the whole file in one HttpResponse from model instances.
+
+    python -m benchmarks.bench_csv_export --rows 1000000
+"""
+import argparse
+import csv
+import time
+
+from benchmarks.utils import peak_rss_mb, scratch_database, seed_requisitions, timer
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core.models import Requisition
+from core.views import request_report
+
+
+def buffered_export(requisitions):
+    # The pre-streaming implementation, kept here as the baseline
+    response = HttpResponse(content_type='text/csv')
+    writer = csv.writer(response)
+    writer.writerow(['ID', 'Equipment', 'Quantity', 'User', 'Request Date', 'Approve Date', 'Reject Date', 'Returned Date', 'Status'])
+    for req in requisitions:
+        writer.writerow([
+            req.pk,
+            req.equipment.name,
+            req.quantity,
+            req.user.username,
+            req.date.strftime('%Y-%m-%d %H:%M'),
+            req.approve_date.strftime('%Y-%m-%d %H:%M') if req.approve_date else '-',
+            req.reject_date.strftime('%Y-%m-%d %H:%M') if req.reject_date else '-',
+            req.actual_return_date.strftime('%Y-%m-%d %H:%M') if req.actual_return_date else '-',
+            req.get_status_display(),
+        ])
+    return response
+
+
+def measure(label, produce):
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    for chunk in produce():
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    total = time.perf_counter() - start
+    print(
+        f'{label:>10}: ttfb {first_byte * 1000:8.1f} ms  total {total:7.2f} s  '
+        f'{size / 1024 / 1024:7.1f} MB  peak RSS +{peak_rss_mb() - rss_before:.1f} MB'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--skip-buffered', action='store_true', help='Only measure the streaming export')
+    args = parser.parse_args()
+
+    with scratch_database():
+        with timer(f'seed {args.rows} requisitions'):
+            staff = seed_requisitions(args.rows)
+
+        request = RequestFactory().get('/report/', {'export': 'csv'})
+        request.user = staff
+
+        # Streaming runs first so its RSS growth is not hidden by the baseline's
+        measure('streaming', lambda: request_report(request).streaming_content)
+        if not args.skip_buffered:
+            requisitions = Requisition.objects.select_related('equipment', 'user').order_by('-date')
+            measure('buffered', lambda: [buffered_export(requisitions).content])
+
+
+if __name__ == '__main__':
+    main()
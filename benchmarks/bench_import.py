@@ -0,0 +1,50 @@
+"""
+Throughput of the bulk equipment import (core.importer).
+
+    python -m benchmarks.bench_import --rows 100000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from benchmarks.utils import scratch_database, timer
+
+from core.importer import import_equipment
+from core.models import Equipment
+
+
+def write_csv(path, rows, categories=200):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['name', 'category', 'total_quantity', 'available_quantity', 'description', 'serial_number', 'status'])
+        for i in range(rows):
+            writer.writerow([f'Item {i}', f'Category {i % categories}', 5, 5, 'Imported by benchmark', f'IMP-{i:08d}', 'AVAILABLE'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'equipment.csv')
+        with timer(f'write {args.rows} row CSV'):
+            write_csv(path, args.rows)
+
+        with scratch_database():
+            start = time.perf_counter()
+            with open(path, 'rb') as file:
+                result = import_equipment(file, path, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - start
+            assert Equipment.objects.count() == result.created
+            print(
+                f'imported {result.created} rows ({len(result.errors)} errors) in {elapsed:.1f}s: '
+                f'{result.rows / elapsed:.0f} rows/s'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Label sheet generation time for a large set of equipment, with a cold
+and a warm QR cache.
+
+    python -m benchmarks.bench_labels --rows 5000
+"""
+import argparse
+import time
+
+from benchmarks.utils import scratch_database, timer
+
+from django.core.cache import caches
+
+from core.models import Category, Equipment
+from core.qrcodes import label_equipment, render_label_sheet
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    with scratch_database():
+        with timer(f'seed {args.rows} equipment'):
+            category = Category.objects.create(name='Warehouse')
+            Equipment.objects.bulk_create([
+                Equipment(name=f'Item {i}', category=category, serial_number=f'WH-{i:06d}')
+                for i in range(args.rows)
+            ])
+
+        caches['qrcodes'].clear()
+        for label in ('cold cache', 'warm cache'):
+            start = time.perf_counter()
+            html = render_label_sheet(label_equipment(category='Warehouse'), 'https://assets.example.com')
+            elapsed = time.perf_counter() - start
+            print(
+                f'{label:>10}: {elapsed:6.2f} s  {elapsed / args.rows * 1000:6.2f} ms/label  '
+                f'{len(html) / 1024 / 1024:6.1f} MB'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Year-long category summary: aggregating Requisition directly versus reading
+the RequisitionDailyStat rollups.
+
+    python -m benchmarks.bench_rollups --rows 1000000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks.utils import scratch_database, seed_requisitions, spread_requisition_dates, timer
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from core.models import Requisition
+from core.rollups import category_summary, rebuild_daily_stats
+
+
+def raw_summary(start_date, end_date):
+    # What a summary costs without rollups: one pass over every requisition in range
+    per_status = {
+        status.lower(): Count('id', filter=Q(status=status))
+        for status, _ in Requisition.STATUS_CHOICES
+    }
+    return list(
+        Requisition.objects.filter(date__date__gte=start_date, date__date__lte=end_date)
+        .values(category_name=F('equipment__category__name'))
+        .annotate(requisitions=Count('id'), total_quantity=Sum('quantity'), **per_status)
+        .order_by('category_name')
+    )
+
+
+def best_of(label, repeat, run):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = run()
+        timings.append(time.perf_counter() - start)
+    print(f'{label:>8}: {min(timings) * 1000:9.2f} ms  ({len(rows)} categories)')
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with scratch_database():
+        with timer(f'seed {args.rows} requisitions over {args.days} days'):
+            seed_requisitions(args.rows)
+            spread_requisition_dates(args.days)
+        with timer('rebuild_daily_stats'):
+            written = rebuild_daily_stats()
+        print(f'{written} rollup rows')
+
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=args.days)
+        raw = best_of('raw', args.repeat, lambda: raw_summary(start_date, end_date))
+        rollup = best_of('rollups', args.repeat, lambda: list(category_summary(start_date, end_date)))
+        assert [row['requisitions'] for row in raw] == [row['requisitions'] for row in rollup]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Latency of the search_equipment endpoint on a large catalog.
+
+On PostgreSQL this exercises the ranked full-text / trigram backend in
+core.search; on other databases it measures the icontains fallback.
+"cold" requests bump the catalog version first, so they always reach the
+database; "cached" requests are served by the catalog cache (core.catalog).
+
+    python -m benchmarks.bench_search --rows 100000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.utils import scratch_database, timer
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+
+from core.catalog import bump_catalog_version, catalog_stats, reset_catalog_stats
+from core.models import Category, Equipment
+from core.views import search_equipment
+
+WORDS = ['Projector', 'Laptop', 'Camera', 'Tripod', 'Speaker', 'Monitor', 'Router', 'Tablet', 'Printer', 'Microphone']
+QUERIES = ['proj', 'laptop', 'cam 4', 'SN-0012', 'speaker', 'monitor 27', 'category 3', 'xyz-none']
+
+
+def seed_equipment(count, chunk_size=10000):
+    categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(50)])
+    rng = random.Random(1)
+    for offset in range(0, count, chunk_size):
+        Equipment.objects.bulk_create([
+            Equipment(
+                name=f'{rng.choice(WORDS)} {rng.choice(WORDS)} {i}',
+                category=categories[i % len(categories)],
+                total_quantity=1,
+                available_quantity=1,
+                serial_number=f'SN-{i:07d}',
+            )
+            for i in range(offset, min(offset + chunk_size, count))
+        ])
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_equipment; ANALYZE core_category;')
+    bump_catalog_version()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with scratch_database():
+        with timer(f'seed {args.rows} equipment'):
+            seed_equipment(args.rows)
+        user = User.objects.create_user(username='bench-user')
+        factory = RequestFactory()
+
+        async def auser():
+            return user
+
+        def timed(query, cold):
+            timings = []
+            for _ in range(args.repeat):
+                if cold:
+                    bump_catalog_version()
+                request = factory.get('/search-equipment/', {'q': query})
+                request.user = user
+                request.auser = auser
+                start = time.perf_counter()
+                async_to_sync(search_equipment)(request)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+        print(f'backend: {connection.vendor}')
+        reset_catalog_stats()
+        for query in QUERIES:
+            cold_median, cold_p95 = timed(query, cold=True)
+            cached_median, cached_p95 = timed(query, cold=False)
+            print(
+                f'{query!r:>14}: cold median {cold_median:7.1f} ms  p95 {cold_p95:7.1f} ms'
+                f'  |  cached median {cached_median:6.2f} ms  p95 {cached_p95:6.2f} ms'
+            )
+        stats = catalog_stats()
+        print(f"catalog cache: {stats['hits']} hits, {stats['misses']} misses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+django_session writes per 1,000 authenticated requests to search_equipment,
+with the stock database session store saving on every request versus
+core.sessions with coalesced expiry refreshes.
+
+Requests are spread over --minutes of simulated time by moving the stored
+expire_date back between requests (outside the measured queries).
+
+    python -m benchmarks.bench_sessions --requests 1000 --minutes 60
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks.utils import scratch_database
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+def stock_settings():
+    from django.conf import settings
+
+    middleware = [
+        'django.contrib.sessions.middleware.SessionMiddleware' if path == 'core.middleware.SessionMiddleware' else path
+        for path in settings.MIDDLEWARE
+    ]
+    return override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.db',
+        SESSION_SAVE_EVERY_REQUEST=True,
+        MIDDLEWARE=middleware,
+    )
+
+
+def run(label, user, requests, minutes):
+    client = Client()
+    client.force_login(user)
+    session_key = client.cookies['sessionid'].value
+    step = timedelta(minutes=minutes) / requests
+    url = reverse('search_equipment')
+
+    writes = queries = 0
+    start = time.perf_counter()
+    for i in range(requests):
+        Session.objects.filter(session_key=session_key).update(expire_date=Session.objects.get(session_key=session_key).expire_date - step)
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url, {'q': f'item {i % 10}'})
+        assert response.status_code == 200
+        queries += len(captured)
+        writes += sum(
+            1 for query in captured
+            if 'django_session' in query['sql'] and query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        )
+    elapsed = time.perf_counter() - start
+    print(f'{label:>10}: {writes:5d} session writes, {queries / requests:.1f} queries/request, {elapsed:.2f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--minutes', type=int, default=60)
+    args = parser.parse_args()
+
+    with scratch_database():
+        user = User.objects.create_user(username='bench-user', password='bench')
+        with stock_settings():
+            run('stock', user, args.requests, args.minutes)
+        run('coalesced', user, args.requests, args.minutes)
+
+
+if __name__ == '__main__':
+    main()
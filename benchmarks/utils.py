@@ -0,0 +1,109 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Each benchmark runs against a scratch copy of the configured database
+(created and destroyed like Django's test database), so it never touches
+real data. Run them from the project root, e.g.
+
+    python -m benchmarks.bench_csv_export --rows 1000000
+
+against the configured PostgreSQL server, or on SQLite with
+DJANGO_SETTINGS_MODULE=config.test_settings.
+"""
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models.functions import Mod
+from django.db.models.lookups import Exact
+from django.utils import timezone
+
+from core.catalog import bump_catalog_version
+from core.models import Category, Equipment, Requisition
+import core.views  # noqa: F401 - applies the integer auth_user flag patch before users are created
+
+
+@contextmanager
+def scratch_database(keepdb=False):
+    """
+    Creates the test database for the default alias, runs migrations and
+    drops it again afterwards.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (ru_maxrss is KB on Linux).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def timer(label):
+    start = time.perf_counter()
+    yield
+    print(f'{label}: {time.perf_counter() - start:.3f}s')
+
+
+def seed_requisitions(count, users=50, equipment=500, chunk_size=10000):
+    """
+    Fills the scratch database with `count` requisitions spread over a
+    small set of users and equipment. Returns the staff user.
+    """
+    staff = User.objects.create_user(username='bench-staff', password='bench', is_staff=True)
+    borrowers = [User.objects.create_user(username=f'bench-user-{i}') for i in range(users)]
+    categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(10)])
+    items = Equipment.objects.bulk_create([
+        Equipment(
+            name=f'Equipment {i}',
+            category=categories[i % len(categories)],
+            total_quantity=10,
+            available_quantity=10,
+            serial_number=f'BENCH-{i:07d}',
+        )
+        for i in range(equipment)
+    ])
+
+    statuses = [choice for choice, _ in Requisition.STATUS_CHOICES]
+    for offset in range(0, count, chunk_size):
+        Requisition.objects.bulk_create([
+            Requisition(
+                user=borrowers[i % len(borrowers)],
+                equipment=items[i % len(items)],
+                quantity=1,
+                status=statuses[i % len(statuses)],
+            )
+            for i in range(offset, min(offset + chunk_size, count))
+        ])
+    # bulk_create sends no post_save
+    bump_catalog_version()
+    return staff
+
+
+def spread_requisition_dates(days):
+    """
+    Spreads the seeded requisitions evenly over the last `days` days
+    (bulk_create stamps them all with the current time).
+    """
+    now = timezone.now()
+    for offset in range(days):
+        Requisition.objects.filter(Exact(Mod('id', days), offset)).update(date=now - timedelta(days=offset))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     # Allauth
     'allauth',
@@ -47,7 +49,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.SessionMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -94,6 +98,70 @@ DATABASES = {
     }   
 }
 
+# Connection reuse. The database is on another subnet, so a fresh TCP + auth
+# handshake per request dominates latency. By default each worker process
+# keeps a psycopg 3 pool (sizes per process, so total connections are about
+# workers * DB_POOL_MAX_SIZE); DB_POOL_MAX_SIZE=0 falls back to persistent
+# connections kept for DB_CONN_MAX_AGE seconds. Both check a connection is
+# alive before handing it out. core.views.db_pool_stats reports the pool.
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 4))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DB_POOL_MAX_SIZE:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': DB_POOL_TIMEOUT,
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+# Read replicas, as comma-separated host[:port] in DB_REPLICA_HOSTS. Views
+# marked with core.routers.replica_reads (reports, search, listings,
+# exports) read from them; a browser that has just written reads from the
+# primary for DATABASE_REPLICA_LAG seconds.
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_LAG = int(os.environ.get('DB_REPLICA_LAG', 10))
+for number, replica in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# File-based so that all worker processes on the host see the same entries
+# (the catalog version, dashboard counters); core.catalog, core.qrcodes and
+# the dashboard counters all use this cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    # Rendered QR codes (core.qrcodes), kept apart so label sheets do not
+    # cull the catalog and dashboard entries above
+    'qrcodes': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'qrcodes',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -131,6 +199,17 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+# collectstatic writes content-hashed, pre-compressed copies here; they are
+# served with far-future caching by core.middleware.StaticFilesMiddleware
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -143,9 +222,13 @@ LOGOUT_REDIRECT_URL = 'login'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Session Management
+SESSION_ENGINE = 'core.sessions'
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_AGE = 60 * 60  # 1 hour
-SESSION_SAVE_EVERY_REQUEST = True
+# Sliding expiry without a write per request: core.middleware.SessionMiddleware
+# re-saves an unchanged session once it is this many seconds old
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_INTERVAL = 5 * 60
 
 # Authentication Backends
 AUTHENTICATION_BACKENDS = [
@@ -0,0 +1,35 @@
+"""
+Settings for the test suite, used by `python manage.py test`.
+
+The shared PostgreSQL server cannot host a fresh test database: its
+auth_user flags are integer columns (see convert_bool_to_int.py and the
+User patch in core.views), which a migrated database does not have. Tests
+run on SQLite instead, without the connection pool or replicas.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        # ConcurrentStockReservationTests: a file rather than the default
+        # shared in-memory database, whose table locks fail at once, and a
+        # timeout to wait for the write lock instead of "database is locked"
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        'OPTIONS': {'timeout': 30},
+    }
+}
+DATABASE_REPLICAS = []
+
+# In-process caches: tests clear them freely, which must not touch the
+# cache directory a development server uses
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'qrcodes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'qrcodes',
+    },
+}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Equipment, Requisition, UserProfile
+from .models import Category, Equipment, Requisition, UserProfile, forget_requisitions
 
 # Register your models here.
 @admin.register(Category)
@@ -10,16 +10,23 @@ class CategoryAdmin(admin.ModelAdmin):
 class EquipmentAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'category', 'total_quantity', 'available_quantity', 'image', 'description', 'serial_number', 'status')
     list_filter = ('category', 'status')
+    list_select_related = ('category',)
     search_fields = ('name', 'serial_number', 'description')
 
 @admin.register(Requisition)
 class RequisitionAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'equipment', 'quantity', 'date', 'status', 'reason', 'return_date', 'actual_return_date', 'approve_date', 'reject_date', 'reject_reason', 'approved_by', 'rejected_by', 'received_by')
     list_filter = ('status', 'date')
+    list_select_related = ('user', 'equipment', 'approved_by', 'rejected_by', 'received_by')
     search_fields = ('user__username', 'equipment__name', 'reason')
 
+    def delete_queryset(self, request, queryset):
+        forget_requisitions(queryset)
+        super().delete_queryset(request, queryset)
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'company', 'branch', 'department', 'employee_id')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'employee_id', 'department')
 
@@ -0,0 +1,169 @@
+"""
+Equipment utilization analytics for the charts page.
+
+All figures are aggregated in the database: each query returns one row per
+equipment, category or day, never one per requisition, so the cost on the
+Python side does not grow with the number of requisitions.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import (
+    Avg, Count, DateTimeField, ExpressionWrapper, F, FloatField, Func, Q, RowRange, Sum, Value, Window,
+)
+from django.db.models.functions import Coalesce, Now, Rank, TruncDate
+from django.utils import timezone
+
+from .models import Requisition
+
+ANALYTICS_DEFAULT_DAYS = 90
+ANALYTICS_TIMEOUT = 60 * 5
+UTILIZATION_LIMIT = 20
+MOVING_AVERAGE_DAYS = 7
+
+
+class HoursBetween(Func):
+    """
+    Hours from the second expression to the first, as a float.
+    """
+    arity = 2
+    output_field = FloatField()
+    template = 'EXTRACT(EPOCH FROM (%(expressions)s)) / 3600.0'
+    arg_joiner = ' - '
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='(julianday(%(expressions)s)) * 24.0',
+            arg_joiner=') - julianday(',
+            **extra_context,
+        )
+
+
+class OverAggregate(Func):
+    """
+    SUM() / AVG() of an aggregate annotation, for use in Window(). Django's
+    Sum and Avg refuse to wrap an aggregate, but SUM(SUM(x)) OVER (...) is
+    valid SQL on a grouped query.
+    """
+    window_compatible = True
+    output_field = FloatField()
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def in_range(queryset, field, start_date, end_date):
+    # Day boundaries instead of __date, so the filter stays a range on the column
+    return queryset.filter(**{
+        f'{field}__gte': start_of_day(start_date),
+        f'{field}__lt': start_of_day(end_date + timedelta(days=1)),
+    })
+
+
+def requisitions_for(category):
+    requisitions = Requisition.objects.all()
+    if category:
+        requisitions = requisitions.filter(equipment__category=category)
+    return requisitions
+
+
+def equipment_utilization(start_date, end_date, category=None, limit=UTILIZATION_LIMIT):
+    """
+    Unit-hours each equipment was out on loans approved in the range (loans
+    still out count up to now), ranked, with the total over all equipment.
+    """
+    loans = in_range(requisitions_for(category), 'approve_date', start_date, end_date)
+    unit_hours = Sum(F('quantity') * HoursBetween(Coalesce('actual_return_date', Now()), 'approve_date'))
+    rows = (
+        loans.values('equipment_id', name=F('equipment__name'))
+        .annotate(loans=Count('id'), unit_hours=unit_hours)
+        .annotate(
+            rank=Window(Rank(), order_by=F('unit_hours').desc()),
+            total_unit_hours=Window(OverAggregate(F('unit_hours'), function='SUM')),
+        )
+        .order_by('rank', 'equipment_id')[:limit]
+    )
+    return [
+        {
+            'equipment_id': row['equipment_id'],
+            'name': row['name'],
+            'rank': row['rank'],
+            'loans': row['loans'],
+            'unit_hours': round(row['unit_hours'], 1),
+            'share': round(100 * row['unit_hours'] / row['total_unit_hours'], 1) if row['total_unit_hours'] else 0,
+        }
+        for row in rows
+    ]
+
+
+def turnaround(start_date, end_date, category=None):
+    """
+    Average hours from request to approval and to rejection, per category,
+    for requisitions made in the range.
+    """
+    requisitions = in_range(requisitions_for(category), 'date', start_date, end_date)
+    rows = (
+        requisitions.values(category_name=F('equipment__category__name'))
+        .annotate(
+            requests=Count('id'),
+            approved=Count('id', filter=Q(approve_date__isnull=False)),
+            rejected=Count('id', filter=Q(reject_date__isnull=False)),
+            approval_hours=Avg(HoursBetween('approve_date', 'date'), filter=Q(approve_date__isnull=False)),
+            rejection_hours=Avg(HoursBetween('reject_date', 'date'), filter=Q(reject_date__isnull=False)),
+        )
+        .order_by('category_name')
+    )
+    return [
+        {
+            **row,
+            'approval_hours': round(row['approval_hours'], 1) if row['approval_hours'] is not None else None,
+            'rejection_hours': round(row['rejection_hours'], 1) if row['rejection_hours'] is not None else None,
+        }
+        for row in rows
+    ]
+
+
+def late_returns(start_date, end_date, category=None):
+    """
+    Returns per day over the range: how many came back, how many after their
+    due day and by how many hours on average, with a moving late rate.
+    """
+    # return_date is the due day at midnight; a loan is late once that day is over
+    due_by = ExpressionWrapper(F('return_date') + Value(timedelta(days=1)), output_field=DateTimeField())
+    returned = in_range(requisitions_for(category), 'actual_return_date', start_date, end_date).filter(
+        status='RETURNED', return_date__isnull=False,
+    )
+    late = Q(actual_return_date__gt=due_by)
+    moving = {'order_by': F('day').asc(), 'frame': RowRange(start=-(MOVING_AVERAGE_DAYS - 1), end=0)}
+    rows = (
+        returned.values(day=TruncDate('actual_return_date'))
+        .annotate(
+            returned=Count('id'),
+            late=Count('id', filter=late),
+            hours_late=Avg(HoursBetween('actual_return_date', due_by), filter=late),
+        )
+        .annotate(
+            returned_window=Window(OverAggregate(F('returned'), function='SUM'), **moving),
+            late_window=Window(OverAggregate(F('late'), function='SUM'), **moving),
+        )
+        .order_by('day')
+    )
+    return [
+        {
+            'day': row['day'].isoformat(),
+            'returned': row['returned'],
+            'late': row['late'],
+            'hours_late': round(row['hours_late'], 1) if row['hours_late'] is not None else None,
+            'late_rate': round(100 * row['late_window'] / row['returned_window'], 1),
+        }
+        for row in rows
+    ]
+
+
+def overdue_count(category=None):
+    """
+    Approved loans whose due day is over (served by requisition_due_idx).
+    """
+    today = start_of_day(timezone.localdate())
+    return requisitions_for(category).filter(status='APPROVED', return_date__lt=today).count()
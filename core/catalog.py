@@ -0,0 +1,182 @@
+"""
+Catalog cache.
+
+Equipment and categories change rarely but are read on every equipment
+list, live search and request page. Results are cached under a key that
+includes the catalog version; any change to an Equipment or Category row
+stores a new version, so every older entry is ignored from then on and
+simply ages out.
+
+Entries are long-lived, so they are only filled from a read replica once
+the version is older than DATABASE_REPLICA_LAG; before that a replica may
+not have the change yet.
+
+The version is bumped by the signals in models.py. Writes that skip
+signals (queryset.update() on stock, bulk_create) must call
+bump_catalog_version themselves.
+
+Hit/miss counters are kept per process and added to the shared cache at
+most every CATALOG_STATS_FLUSH_INTERVAL seconds, so counting a read does not
+write to the cache backend (a file on disk, by default) on every request.
+"""
+import hashlib
+import threading
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .routers import primary_reads
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_HITS_KEY = 'catalog:hits'
+CATALOG_MISSES_KEY = 'catalog:misses'
+CATALOG_TIMEOUT = 60 * 60
+CATALOG_STATS_FLUSH_INTERVAL = 30
+
+_pending_counts = {CATALOG_HITS_KEY: 0, CATALOG_MISSES_KEY: 0}
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def new_version():
+    # Unique rather than incremented, so a version lost with the cache is never reused
+    return time.time_ns()
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, new_version(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def acatalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, new_version(), None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidates everything cached for the catalog. Inside a transaction the
+    version is bumped again on commit, so a request that cached the old
+    rows under the intermediate version does not keep serving them.
+    """
+    cache.set(CATALOG_VERSION_KEY, new_version(), None)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.set(CATALOG_VERSION_KEY, new_version(), None))
+
+
+def catalog_key(name, *parts, version=None):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'catalog:{version or catalog_version()}:{name}:{digest}'
+
+
+def fill_reads(version):
+    if time.time_ns() - version < settings.DATABASE_REPLICA_LAG * 1_000_000_000:
+        return primary_reads()
+    return nullcontext()
+
+
+def take_pending_counts(force=False):
+    """
+    Returns this process's unflushed counts and zeroes them, or an empty
+    dict if the last flush was under CATALOG_STATS_FLUSH_INTERVAL ago.
+    """
+    global _last_flush
+    with _pending_lock:
+        if not force and time.monotonic() - _last_flush < CATALOG_STATS_FLUSH_INTERVAL:
+            return {}
+        counts = {key: value for key, value in _pending_counts.items() if value}
+        _pending_counts.update(dict.fromkeys(_pending_counts, 0))
+        _last_flush = time.monotonic()
+    return counts
+
+
+def flush_catalog_stats(force=True):
+    for key, value in take_pending_counts(force).items():
+        if not cache.add(key, value, None):
+            cache.incr(key, value)
+
+
+def add_pending_count(key):
+    with _pending_lock:
+        _pending_counts[key] += 1
+
+
+def count(key):
+    add_pending_count(key)
+    flush_catalog_stats(force=False)
+
+
+def catalog_cached(name, parts, compute, timeout=CATALOG_TIMEOUT):
+    """
+    Returns the cached value for (name, *parts) at the current catalog
+    version, calling compute() and storing its result on a miss.
+    """
+    version = catalog_version()
+    key = catalog_key(name, *parts, version=version)
+    value = cache.get(key)
+    if value is None:
+        count(CATALOG_MISSES_KEY)
+        with fill_reads(version):
+            value = compute()
+        cache.set(key, value, timeout)
+    else:
+        count(CATALOG_HITS_KEY)
+    return value
+
+
+async def aflush_catalog_stats(force=True):
+    for key, value in take_pending_counts(force).items():
+        if not await cache.aadd(key, value, None):
+            await cache.aincr(key, value)
+
+
+async def acount(key):
+    add_pending_count(key)
+    await aflush_catalog_stats(force=False)
+
+
+async def acatalog_cached(name, parts, compute, timeout=CATALOG_TIMEOUT):
+    """
+    catalog_cached() for async views; `compute` is a coroutine function.
+    """
+    version = await acatalog_version()
+    key = catalog_key(name, *parts, version=version)
+    value = await cache.aget(key)
+    if value is None:
+        await acount(CATALOG_MISSES_KEY)
+        with fill_reads(version):
+            value = await compute()
+        await cache.aset(key, value, timeout)
+    else:
+        await acount(CATALOG_HITS_KEY)
+    return value
+
+
+def catalog_stats():
+    """
+    Counters summed over every process, as of each one's last flush; this
+    process's own counts are flushed first.
+    """
+    flush_catalog_stats()
+    counts = cache.get_many([CATALOG_HITS_KEY, CATALOG_MISSES_KEY])
+    hits, misses = counts.get(CATALOG_HITS_KEY, 0), counts.get(CATALOG_MISSES_KEY, 0)
+    return {
+        'version': cache.get(CATALOG_VERSION_KEY),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(100 * hits / (hits + misses), 1) if hits + misses else None,
+    }
+
+
+def reset_catalog_stats():
+    take_pending_counts(force=True)
+    cache.delete_many([CATALOG_HITS_KEY, CATALOG_MISSES_KEY])
@@ -0,0 +1,39 @@
+"""
+Database connection reuse, as configured in settings.DATABASES (see the
+DB_POOL_* settings).
+
+Each worker process has its own pool, so the numbers reported here are
+for the process that served the request, not the whole deployment.
+"""
+import os
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def connection_mode(connection):
+    if getattr(connection, 'pool', None) is not None:
+        return 'pool'
+    if connection.settings_dict['CONN_MAX_AGE'] != 0:
+        return 'persistent'
+    return 'per-request'
+
+
+def pool_stats(using=DEFAULT_DB_ALIAS):
+    """
+    How connections to `using` are reused by this process, with the
+    psycopg pool counters (requests_waiting, pool_available, connections_num,
+    ...) when pooling is on.
+    """
+    connection = connections[using]
+    mode = connection_mode(connection)
+    stats = {
+        'alias': using,
+        'vendor': connection.vendor,
+        'pid': os.getpid(),
+        'mode': mode,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+    }
+    if mode == 'pool':
+        stats['pool'] = connection.pool.get_stats()
+    return stats
@@ -69,6 +69,10 @@ class RequisitionForm(forms.ModelForm):
             'return_date': forms.DateInput(attrs={'type': 'date'}),
         }
 
+class CheckoutForm(forms.Form):
+    return_date = forms.DateTimeField(widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    reason = forms.CharField(required=False, widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2}))
+
 class EquipmentForm(forms.ModelForm):
     class Meta:
         model = Equipment
@@ -84,6 +88,38 @@ class EquipmentForm(forms.ModelForm):
             'status': forms.Select(attrs={'class': 'form-control'}),
         }
 
+class EquipmentImportForm(EquipmentForm):
+    """
+    Validates one row of a bulk import with the same field rules as
+    EquipmentForm. The category is given by name and serial number
+    uniqueness is checked per batch by core.importer, not per row.
+    """
+    category_name = forms.CharField(max_length=100)
+
+    class Meta(EquipmentForm.Meta):
+        fields = ['name', 'total_quantity', 'available_quantity', 'description', 'serial_number', 'status']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        total_quantity = cleaned_data.get('total_quantity')
+        available_quantity = cleaned_data.get('available_quantity')
+        if total_quantity is not None and available_quantity is not None and available_quantity > total_quantity:
+            raise forms.ValidationError("Available quantity cannot be greater than Total quantity.")
+        return cleaned_data
+
+    def _get_validation_exclusions(self):
+        # core.importer checks serial numbers for a whole chunk in one query
+        # instead of one query per row; other unique checks still run
+        exclude = super()._get_validation_exclusions()
+        exclude.add('serial_number')
+        return exclude
+
+class EquipmentImportUploadForm(forms.Form):
+    file = forms.FileField(
+        label="CSV or XLSX file",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control-file', 'accept': '.csv,.xlsx'}),
+    )
+
 from .models import Category
 class RequisitionFilterForm(forms.Form):
     start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
@@ -0,0 +1,176 @@
+"""
+Bulk equipment import from CSV or XLSX.
+
+Rows are parsed as a stream, validated with EquipmentImportForm and
+written in chunks with bulk_create. Invalid rows are reported with their
+row number and skipped; they never abort the rest of the import.
+
+Expected columns (header row, case-insensitive): name, category,
+total_quantity, available_quantity, description, serial_number, status.
+"""
+import csv
+import io
+import os
+
+from django.db import IntegrityError, transaction
+
+from .catalog import bump_catalog_version
+from .forms import EquipmentImportForm
+from .models import Category, Equipment, invalidate_dashboard_counts
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_COLUMNS = ['name', 'category', 'total_quantity', 'available_quantity', 'description', 'serial_number', 'status']
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []  # (row number, message)
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+def read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        header = next(reader, [])
+        for row in reader:
+            yield header, row
+    finally:
+        text.detach()
+
+
+def read_xlsx(file):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        for row in rows:
+            yield header, row
+    finally:
+        workbook.close()
+
+
+def iter_rows(file, filename):
+    """
+    Yields (row number, {column: value}) for each data row. Row numbers
+    match the spreadsheet, i.e. the first data row is 2.
+    """
+    reader = read_xlsx if os.path.splitext(filename)[1].lower() == '.xlsx' else read_csv
+    columns = None
+    for row_number, (header, values) in enumerate(reader(file), start=2):
+        if columns is None:
+            columns = [str(name or '').strip().lower() for name in header]
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield row_number, {
+            column: '' if value is None else str(value).strip()
+            for column, value in zip(columns, values)
+            if column in IMPORT_COLUMNS
+        }
+
+
+def resolve_categories(names, categories):
+    """
+    Fills `categories` (name -> id) for every name in `names`, creating the
+    missing ones with one bulk_create.
+    """
+    missing = set(names) - categories.keys()
+    if not missing:
+        return
+    for pk, name in Category.objects.filter(name__in=missing).order_by('-pk').values_list('pk', 'name'):
+        categories[name] = pk
+    to_create = [Category(name=name) for name in missing - categories.keys()]
+    for category in Category.objects.bulk_create(to_create):
+        categories[category.name] = category.pk
+
+
+def import_chunk(chunk, categories, seen_serials, result):
+    """
+    Validates and inserts one chunk of (row number, data) pairs.
+    """
+    valid = []
+    for row_number, data in chunk:
+        form = EquipmentImportForm({
+            'name': data.get('name', ''),
+            'category_name': data.get('category', ''),
+            'total_quantity': data.get('total_quantity') or 0,
+            'available_quantity': data.get('available_quantity') or 0,
+            'description': data.get('description', ''),
+            'serial_number': data.get('serial_number', ''),
+            'status': data.get('status') or 'AVAILABLE',
+        })
+        if not form.is_valid():
+            messages = [
+                f'{field}: {error}' if field != '__all__' else error
+                for field, errors in form.errors.items()
+                for error in errors
+            ]
+            result.add_error(row_number, '; '.join(messages))
+            continue
+
+        serial = form.cleaned_data['serial_number']
+        if serial and serial in seen_serials:
+            result.add_error(row_number, f'serial_number: {serial} appears more than once in the file.')
+            continue
+        if serial:
+            seen_serials.add(serial)
+        valid.append((row_number, form.save(commit=False), form.cleaned_data['category_name']))
+
+    serials = [equipment.serial_number for _, equipment, _ in valid if equipment.serial_number]
+    existing = set(Equipment.objects.filter(serial_number__in=serials).values_list('serial_number', flat=True))
+
+    resolve_categories({name for _, _, name in valid}, categories)
+
+    to_create = []
+    for row_number, equipment, category_name in valid:
+        if equipment.serial_number in existing:
+            result.add_error(row_number, f'serial_number: Equipment with serial number {equipment.serial_number} already exists.')
+            continue
+        equipment.category_id = categories[category_name]
+        to_create.append((row_number, equipment))
+
+    try:
+        with transaction.atomic():
+            Equipment.objects.bulk_create([equipment for _, equipment in to_create])
+        result.created += len(to_create)
+    except IntegrityError:
+        # A concurrent write took one of the serials; fall back to row by row
+        for row_number, equipment in to_create:
+            try:
+                with transaction.atomic():
+                    equipment.save(force_insert=True)
+                result.created += 1
+            except IntegrityError as exc:
+                result.add_error(row_number, str(exc))
+
+
+def import_equipment(file, filename, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Imports every row of `file` (a binary file object). Returns an
+    ImportResult with the number of created rows and per-row errors.
+    """
+    result = ImportResult()
+    categories = {}
+    seen_serials = set()
+    chunk = []
+
+    for row_number, data in iter_rows(file, filename):
+        result.rows += 1
+        chunk.append((row_number, data))
+        if len(chunk) >= chunk_size:
+            import_chunk(chunk, categories, seen_serials, result)
+            chunk = []
+    if chunk:
+        import_chunk(chunk, categories, seen_serials, result)
+
+    # bulk_create sends no post_save
+    invalidate_dashboard_counts()
+    bump_catalog_version()
+    result.errors.sort()
+    return result
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from core.catalog import bump_catalog_version
+from core.models import Equipment
+from core.renditions import RENDITION_ERRORS, generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Creates missing thumbnail / WebP renditions for existing equipment images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild renditions that already exist.')
+
+    def handle(self, *args, **options):
+        equipment_list = Equipment.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image')
+        built = skipped = failed = 0
+
+        for equipment in equipment_list.iterator(chunk_size=500):
+            try:
+                written = generate_renditions(equipment.image, overwrite=options['force'])
+            except RENDITION_ERRORS as exc:
+                failed += 1
+                self.stderr.write(f'{equipment.pk}: {equipment.image.name}: {exc}')
+                continue
+            if written:
+                built += 1
+            else:
+                skipped += 1
+        if built:
+            # Cached equipment pages list the renditions that existed then
+            bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Renditions built for {built} images, {skipped} already up to date, {failed} failed.'
+        ))
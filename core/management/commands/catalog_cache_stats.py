@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.catalog import catalog_stats, reset_catalog_stats
+
+
+class Command(BaseCommand):
+    help = 'Shows hit/miss counters of the catalog cache (core.catalog); processes add theirs every 30 seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them.')
+
+    def handle(self, *args, **options):
+        stats = catalog_stats()
+        hit_rate = f"{stats['hit_rate']}%" if stats['hit_rate'] is not None else 'n/a'
+        self.stdout.write(
+            f"Catalog version {stats['version']}: {stats['hits']} hits, {stats['misses']} misses, hit rate {hit_rate}."
+        )
+        if options['reset']:
+            reset_catalog_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import IMPORT_CHUNK_SIZE, import_equipment
+
+
+class Command(BaseCommand):
+    help = 'Bulk-imports equipment from a CSV or XLSX file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with a header row.')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Rows validated and inserted per batch.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_equipment(file, options['path'], chunk_size=options['chunk_size'])
+        except OSError as exc:
+            raise CommandError(exc)
+        elapsed = time.perf_counter() - start
+
+        for row_number, message in result.errors:
+            self.stderr.write(f'row {row_number}: {message}')
+
+        rate = result.rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} of {result.rows} rows ({len(result.errors)} skipped) '
+            f'in {elapsed:.1f}s, {rate:.0f} rows/s'
+        ))
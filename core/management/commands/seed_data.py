@@ -0,0 +1,62 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from core.seeding import SEED_CHUNK_SIZE, SEED_PASSWORD, can_copy, seed_data
+import core.views  # noqa: F401 - applies the integer auth_user flag patch before users are created
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with a deterministic synthetic dataset (users, catalog, requisitions) for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisitions', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=5000, help='Borrowers, each with a UserProfile.')
+        parser.add_argument('--staff', type=int, default=20, help='Staff users who approve, reject and receive.')
+        parser.add_argument('--equipment', type=int, default=20000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--days', type=int, default=730, help='Requisitions are spread over this many days.')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last day of the period (YYYY-MM-DD, default today).')
+        parser.add_argument('--seed', type=int, default=0, help='Same seed and arguments, same rows.')
+        parser.add_argument('--chunk-size', type=int, default=SEED_CHUNK_SIZE, help='Rows written per batch.')
+        parser.add_argument('--no-copy', action='store_true', help='Use INSERT even where COPY is available.')
+
+    def handle(self, *args, **options):
+        use_copy = can_copy() and not options['no_copy']
+        requisitions = options['requisitions']
+        start = time.perf_counter()
+
+        def progress(written):
+            if options['verbosity'] > 1 or written == requisitions:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'  {written}/{requisitions} requisitions, {written / elapsed:.0f} rows/s')
+
+        self.stdout.write(f"Seeding with seed {options['seed']} ({'COPY' if use_copy else 'INSERT'})...")
+        try:
+            result = seed_data(
+                requisitions,
+                users=options['users'],
+                staff=options['staff'],
+                equipment=options['equipment'],
+                categories=options['categories'],
+                days=options['days'],
+                seed=options['seed'],
+                until=options['until'],
+                chunk_size=options['chunk_size'],
+                use_copy=use_copy,
+                progress=progress,
+            )
+        except IntegrityError as exc:
+            raise CommandError(f"Could not seed (already seeded with seed {options['seed']}?): {exc}")
+
+        for name, rows in result.rows.items():
+            elapsed = result.elapsed[name]
+            rate = rows / elapsed if elapsed else 0
+            self.stdout.write(f'{name:>22}: {rows:10d} rows in {elapsed:7.2f}s, {rate:8.0f} rows/s')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {result.total_rows} rows in {elapsed:.1f}s, {result.total_rows / elapsed:.0f} rows/s. '
+            f'Seeded users log in with the password {SEED_PASSWORD!r}.'
+        ))
@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from core.overdue import OVERDUE_SWEEP_LIMIT, sweep_overdue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Flags newly overdue requisitions and emails one digest per borrower and approver.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=OVERDUE_SWEEP_LIMIT, help='Maximum requisitions flagged per sweep.')
+        parser.add_argument('--every', type=int, metavar='SECONDS', help='Keep running, sweeping every SECONDS seconds.')
+
+    def handle(self, *args, **options):
+        if not options['every']:
+            self.sweep(options['limit'], report_empty=True)
+            return
+        while True:
+            # Outside a request nothing else drops a connection the server
+            # closed or one past CONN_MAX_AGE, so do it before every sweep
+            close_old_connections()
+            try:
+                result = self.sweep(options['limit'], report_empty=False)
+            except DatabaseError:
+                logger.exception('Overdue sweep failed; retrying in %s seconds', options['every'])
+                time.sleep(options['every'])
+                continue
+            # A full batch means there is more backlog; sweep again straight away
+            if result.flagged < options['limit']:
+                time.sleep(options['every'])
+
+    def sweep(self, limit, report_empty):
+        start = time.perf_counter()
+        result = sweep_overdue(limit=limit)
+        if result.flagged or report_empty:
+            self.stdout.write(
+                f'Flagged {result.flagged} overdue requisitions, sent {result.emails} digests '
+                f'in {time.perf_counter() - start:.2f}s.'
+            )
+        return result
@@ -0,0 +1,114 @@
+from urllib.parse import urlparse
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware as BaseSessionMiddleware
+from django.core.files.storage import storages
+
+from .routers import PIN_COOKIE, request_routing
+from .staticfiles import serve_static
+
+
+class SessionMiddleware(BaseSessionMiddleware):
+    """
+    Saves a session that was not modified only when its store says the
+    expiry is due for a refresh (see core.sessions), instead of on every
+    request. Use with SESSION_SAVE_EVERY_REQUEST = False.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if (
+            session is not None
+            and session.accessed
+            and not session.modified
+            and hasattr(session, 'refresh_due')
+            and not session.is_empty()
+            and session.refresh_due()
+        ):
+            session.modified = True
+        return super().process_response(request, response)
+
+
+class StaticFilesMiddleware:
+    """
+    Serves collected static files (STATIC_ROOT) in production, without
+    going through the rest of the middleware stack. Content-hashed names
+    from the staticfiles manifest get far-future Cache-Control; see
+    core.staticfiles. Requests for files that were not collected fall
+    through, e.g. to runserver's static handler during development.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefix = urlparse(settings.STATIC_URL).path
+        storage = storages['staticfiles']
+        self.immutable_names = set(getattr(storage, 'hashed_files', {}).values())
+
+    def static_name(self, request):
+        if settings.STATIC_ROOT and request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            return request.path_info[len(self.prefix):]
+        return None
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        name = self.static_name(request)
+        if name is not None:
+            response = serve_static(request, name, self.immutable_names)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        name = self.static_name(request)
+        if name is not None:
+            # File system lookups; off the event loop, not tied to the request's DB thread
+            response = await sync_to_async(serve_static, thread_sensitive=False)(request, name, self.immutable_names)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks database routing for each request (see core.routers) and keeps
+    a browser that has just written on the primary for
+    DATABASE_REPLICA_LAG seconds, so it reads its own writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with request_routing(pinned=PIN_COOKIE in request.COOKIES) as state:
+            response = self.get_response(request)
+        return self.pin_writer(state, response)
+
+    async def __acall__(self, request):
+        # Views and sync_to_async calls run in copies of this context, so
+        # they all see (and update) the same state
+        with request_routing(pinned=PIN_COOKIE in request.COOKIES) as state:
+            response = await self.get_response(request)
+        return self.pin_writer(state, response)
+
+    def pin_writer(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_LAG, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,47 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models.functions import Upper
+
+# PostgreSQL-only indexes for core.search. They are created outside the
+# migration state so SQLite (used in tests) is unaffected.
+EQUIPMENT_INDEXES = [
+    GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='equipment_name_trgm'),
+    GinIndex(OpClass(Upper('serial_number'), name='gin_trgm_ops'), name='equipment_serial_trgm'),
+    # Same expression as core.search.equipment_search_vector()
+    GinIndex(SearchVector('name', 'serial_number', config='simple'), name='equipment_search_vector'),
+]
+CATEGORY_INDEXES = [
+    GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='category_name_trgm'),
+]
+
+
+def add_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, indexes in (('Equipment', EQUIPMENT_INDEXES), ('Category', CATEGORY_INDEXES)):
+        model = apps.get_model('core', model_name)
+        for index in indexes:
+            schema_editor.add_index(model, index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, indexes in (('Equipment', EQUIPMENT_INDEXES), ('Category', CATEGORY_INDEXES)):
+        model = apps.get_model('core', model_name)
+        for index in indexes:
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_requisition_approved_by_requisition_received_by_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_equipment_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['status', 'category'], name='equipment_status_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(fields=['user', '-date', '-id'], name='requisition_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(fields=['user', 'status', '-date', '-id'], name='requisition_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(fields=['status', '-id'], name='requisition_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(fields=['-date'], name='requisition_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(condition=models.Q(('status', 'APPROVED')), fields=['return_date'], name='requisition_due_idx'),
+        ),
+    ]
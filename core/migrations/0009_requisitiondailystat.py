@@ -0,0 +1,56 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_stats(apps, schema_editor):
+    # Same aggregation as core.rollups.rebuild_daily_stats
+    Requisition = apps.get_model('core', 'Requisition')
+    RequisitionDailyStat = apps.get_model('core', 'RequisitionDailyStat')
+    rows = (
+        Requisition.objects.annotate(day=TruncDate('date'))
+        .values('day', 'status', category_id=F('equipment__category_id'))
+        .annotate(requisition_count=Count('id'), total_quantity=Sum('quantity'))
+        .order_by()
+    )
+    RequisitionDailyStat.objects.bulk_create(
+        (
+            RequisitionDailyStat(
+                day=row['day'],
+                category_id=row['category_id'],
+                status=row['status'],
+                requisition_count=row['requisition_count'],
+                quantity=row['total_quantity'],
+            )
+            for row in rows.iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_requisition_equipment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequisitionDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected'), ('RETURNED', 'Returned')], max_length=20)),
+                ('requisition_count', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'category', 'status'), name='requisition_daily_stat_unique')],
+            },
+        ),
+        migrations.RunPython(populate_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_requisitiondailystat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(fields=['approve_date'], name='requisition_approve_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(condition=models.Q(('status', 'RETURNED')), fields=['actual_return_date'], name='requisition_returned_idx'),
+        ),
+    ]
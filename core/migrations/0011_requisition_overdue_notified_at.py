@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_requisition_analytics_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requisition',
+            name='overdue_notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(condition=models.Q(('overdue_notified_at__isnull', True), ('status', 'APPROVED')), fields=['return_date'], name='requisition_overdue_idx'),
+        ),
+    ]
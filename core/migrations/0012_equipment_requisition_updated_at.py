@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_requisition_overdue_notified_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='requisition',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['updated_at'], name='equipment_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requisition',
+            index=models.Index(fields=['user', 'updated_at'], name='requisition_user_updated_idx'),
+        ),
+    ]
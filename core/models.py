@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .renditions import RENDITION_ERRORS, delete_renditions, generate_renditions, rendition_urls
+
 # Create your models here.
 
 class Category(models.Model):
@@ -25,10 +27,28 @@ class Equipment(models.Model):
         ('DAMAGED', 'Damaged'),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='AVAILABLE')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Equipment labels and list filters: status, optionally narrowed by category
+            models.Index(fields=['status', 'category'], name='equipment_status_cat_idx'),
+            # Conditional GETs on the equipment list / search: MAX(updated_at)
+            models.Index(fields=['updated_at'], name='equipment_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def renditions(self):
+        """
+        URLs of the resized image renditions, e.g. renditions.thumb_webp.
+        """
+        if not self.image:
+            return {}
+        return rendition_urls(self.image.name, self.image.storage)
+
 class Requisition(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -52,10 +72,42 @@ class Requisition(models.Model):
     approved_by = models.ForeignKey(User, related_name='approved_requisitions', on_delete=models.SET_NULL, null=True, blank=True)
     rejected_by = models.ForeignKey(User, related_name='rejected_requisitions', on_delete=models.SET_NULL, null=True, blank=True)
     received_by = models.ForeignKey(User, related_name='received_requisitions', on_delete=models.SET_NULL, null=True, blank=True)
+    overdue_notified_at = models.DateTimeField(null=True, blank=True) # Set by the overdue sweeper (core.overdue)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # my_requests: a user's history, newest first, keyset on (date, id)
+            models.Index(fields=['user', '-date', '-id'], name='requisition_user_date_idx'),
+            # my_requests?status=... and the dashboard's pending count per user
+            models.Index(fields=['user', 'status', '-date', '-id'], name='requisition_user_status_idx'),
+            # manage_requests?status=..., keyset on id
+            models.Index(fields=['status', '-id'], name='requisition_status_idx'),
+            # request_report: date range, newest first
+            models.Index(fields=['-date'], name='requisition_date_idx'),
+            # Overdue loans: only approved requisitions have a due date that matters
+            models.Index(fields=['return_date'], condition=models.Q(status='APPROVED'), name='requisition_due_idx'),
+            # The overdue sweeper: approved loans not flagged yet; flagged rows leave the index
+            models.Index(
+                fields=['return_date'],
+                condition=models.Q(status='APPROVED', overdue_notified_at__isnull=True),
+                name='requisition_overdue_idx',
+            ),
+            # Utilization analytics: loans approved / returned in a date range
+            models.Index(fields=['approve_date'], name='requisition_approve_date_idx'),
+            models.Index(fields=['actual_return_date'], condition=models.Q(status='RETURNED'), name='requisition_returned_idx'),
+            # Conditional GETs on my_requests: MAX(updated_at) of a user's requisitions
+            models.Index(fields=['user', 'updated_at'], name='requisition_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.equipment.name} ({self.status})"
 
+    def delete(self, *args, **kwargs):
+        # Requisition has no delete signals (see forget_requisitions below)
+        forget_requisitions(Requisition.objects.filter(pk=self.pk))
+        return super().delete(*args, **kwargs)
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     company = models.CharField(max_length=100, blank=True)
@@ -66,11 +118,36 @@ class UserProfile(models.Model):
     def __str__(self):
         return self.user.username
 
+class RequisitionDailyStat(models.Model):
+    """
+    Requisitions per day, category and current status, maintained by the
+    signals below (see core.rollups). Used by reports instead of scanning
+    Requisition.
+    """
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=Requisition.STATUS_CHOICES)
+    requisition_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category', 'status'], name='requisition_daily_stat_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category_id} {self.status}: {self.requisition_count}"
+
 
 # Signals to handle image deletion
+import logging
 import os
 from django.dispatch import receiver
-from django.db.models.signals import pre_save, post_delete
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_delete, sender=Equipment)
 def auto_delete_file_on_delete(sender, instance, **kwargs):
@@ -81,6 +158,7 @@ def auto_delete_file_on_delete(sender, instance, **kwargs):
     if instance.image:
         if os.path.isfile(instance.image.path):
             os.remove(instance.image.path)
+        delete_renditions(instance.image.name, instance.image.storage)
 
 @receiver(pre_save, sender=Equipment)
 def auto_delete_file_on_change(sender, instance, **kwargs):
@@ -101,6 +179,22 @@ def auto_delete_file_on_change(sender, instance, **kwargs):
     if not old_file == new_file:
         if old_file and os.path.isfile(old_file.path):
             os.remove(old_file.path)
+        if old_file:
+            delete_renditions(old_file.name, old_file.storage)
+
+@receiver(post_save, sender=Equipment)
+def auto_create_renditions(sender, instance, raw=False, **kwargs):
+    """
+    Creates thumbnail / WebP renditions when an image is uploaded.
+    Renditions that already exist are left alone.
+    """
+    if raw or not instance.image:
+        return
+    try:
+        generate_renditions(instance.image)
+    except RENDITION_ERRORS:
+        # Unreadable image; the build_renditions command can retry later
+        logger.exception('Could not create renditions for %s', instance.image.name)
 
 @receiver(models.signals.post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -112,3 +206,101 @@ def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, 'userprofile'):
         instance.userprofile.save()
 
+# Dashboard counter cache, see views.aget_dashboard_counts
+DASHBOARD_COUNTS_KEY = 'dashboard:counts'
+DASHBOARD_COUNTS_TIMEOUT = 60 * 5  # upper bound for changes made without signals (e.g. bulk updates)
+
+def dashboard_user_counts_key(user_id):
+    return f'dashboard:counts:user:{user_id}'
+
+def invalidate_dashboard_counts(user_ids=()):
+    """
+    Drops the global counters and those of the given users. Call this after
+    bulk writes, which do not send post_save / post_delete. Inside a
+    transaction they are dropped again on commit, so a dashboard that
+    cached the pre-commit counts in the meantime does not keep them.
+    """
+    keys = [DASHBOARD_COUNTS_KEY] + [dashboard_user_counts_key(user_id) for user_id in set(user_ids)]
+    cache.delete_many(keys)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+@receiver(post_save, sender=Requisition)
+def invalidate_dashboard_requisition_counts(sender, instance, **kwargs):
+    invalidate_dashboard_counts([instance.user_id])
+
+@receiver(post_save, sender=Equipment)
+def invalidate_dashboard_equipment_count_on_create(sender, instance, created, **kwargs):
+    if created:
+        invalidate_dashboard_counts()
+
+@receiver(post_delete, sender=Equipment)
+def invalidate_dashboard_equipment_count_on_delete(sender, instance, **kwargs):
+    invalidate_dashboard_counts()
+
+# Daily requisition rollups, see core.rollups
+from .rollups import move_equipment_stats, record_requisition_change, remove_requisition_stats, rollup_row
+
+def stored_rollup_row(requisition_id):
+    return (
+        Requisition.objects.filter(pk=requisition_id)
+        .values_list('date', 'equipment_id', 'status', 'quantity')
+        .first()
+    )
+
+@receiver(pre_save, sender=Requisition)
+def remember_requisition_rollup_row(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk and not raw:
+        instance._rollup_previous = stored_rollup_row(instance.pk)
+
+@receiver(post_save, sender=Requisition)
+def update_requisition_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_requisition_change(getattr(instance, '_rollup_previous', None), rollup_row(instance))
+
+def forget_requisitions(requisitions):
+    """
+    Takes a queryset of requisitions that are about to be deleted out of the
+    rollups and dashboard counters, in two queries however many rows it
+    holds. Requisition deliberately has no pre/post_delete receivers, so
+    that deleting an equipment or user can fast-delete its requisitions in
+    one DELETE; every deletion path calls this instead: Requisition.delete(),
+    the pre_delete receivers below and the admin. Category deletions go
+    through Equipment's receiver, and the category's rollup rows cascade.
+    """
+    remove_requisition_stats(requisitions)
+    invalidate_dashboard_counts(requisitions.values_list('user_id', flat=True).distinct())
+
+@receiver(pre_delete, sender=Equipment)
+def forget_equipment_requisitions(sender, instance, **kwargs):
+    forget_requisitions(Requisition.objects.filter(equipment=instance))
+
+@receiver(pre_delete, sender=User)
+def forget_user_requisitions(sender, instance, **kwargs):
+    forget_requisitions(Requisition.objects.filter(user=instance))
+
+@receiver(pre_save, sender=Equipment)
+def remember_equipment_category(sender, instance, raw=False, **kwargs):
+    instance._previous_category_id = None
+    if instance.pk and not raw:
+        instance._previous_category_id = (
+            Equipment.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        )
+
+@receiver(post_save, sender=Equipment)
+def move_equipment_rollups(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_category_id', None)
+    if previous and previous != instance.category_id:
+        move_equipment_stats(instance.pk, previous, instance.category_id)
+
+# Catalog cache, see core.catalog
+from .catalog import bump_catalog_version
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, instance, **kwargs):
+    bump_catalog_version()
@@ -0,0 +1,95 @@
+"""
+Overdue loan sweeper.
+
+Finds approved requisitions whose due day is over and that have not been
+flagged yet, flags them (overdue_notified_at) and sends one digest per
+borrower and one per approver, over a single mail connection. Flagged
+rows drop out of the partial index the sweep reads, so a run with nothing
+new to report is a single index lookup; it is safe to run every minute
+(see the sweep_overdue command).
+"""
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .analytics import start_of_day
+from .models import Requisition
+
+OVERDUE_SWEEP_LIMIT = 2000
+
+
+class SweepResult:
+    def __init__(self):
+        self.flagged = 0
+        self.emails = 0
+
+
+def overdue_requisitions(now=None):
+    """
+    Approved requisitions past their due day that no sweep has flagged yet.
+    Served by requisition_overdue_idx.
+    """
+    today = start_of_day(timezone.localdate(now))
+    return Requisition.objects.filter(status='APPROVED', return_date__lt=today, overdue_notified_at__isnull=True)
+
+
+def digest_message(recipient, requisitions, as_approver):
+    body = render_to_string('emails/overdue_digest.txt', {
+        'recipient': recipient,
+        'requisitions': requisitions,
+        'as_approver': as_approver,
+    })
+    subject = f'{len(requisitions)} overdue item{"s" if len(requisitions) != 1 else ""}'
+    return EmailMessage(subject, body, to=[recipient.email])
+
+
+def sweep_overdue(limit=OVERDUE_SWEEP_LIMIT, now=None):
+    """
+    Flags up to `limit` newly overdue requisitions and mails the digests.
+    Rows are locked with SKIP LOCKED, so overlapping runs never pick the same
+    rows, and the flags are only committed once the mail has been handed to
+    the backend: if sending fails, the next run tries again.
+    """
+    now = now or timezone.now()
+    result = SweepResult()
+
+    with transaction.atomic():
+        requisitions = list(
+            overdue_requisitions(now)
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('equipment')
+            .only('pk', 'user_id', 'approved_by_id', 'quantity', 'return_date', 'equipment__name')
+            .order_by('return_date', 'pk')[:limit]
+        )
+        if not requisitions:
+            return result
+
+        by_borrower = defaultdict(list)
+        by_approver = defaultdict(list)
+        for requisition in requisitions:
+            by_borrower[requisition.user_id].append(requisition)
+            if requisition.approved_by_id:
+                by_approver[requisition.approved_by_id].append(requisition)
+
+        users = User.objects.in_bulk(set(by_borrower) | set(by_approver))
+        for requisition in requisitions:
+            requisition.borrower = users.get(requisition.user_id)
+
+        messages = [
+            digest_message(users[user_id], items, as_approver=False)
+            for user_id, items in by_borrower.items() if user_id in users and users[user_id].email
+        ] + [
+            digest_message(users[user_id], items, as_approver=True)
+            for user_id, items in by_approver.items() if user_id in users and users[user_id].email
+        ]
+
+        Requisition.objects.filter(pk__in=[requisition.pk for requisition in requisitions]).update(overdue_notified_at=now, updated_at=now)
+        if messages:
+            result.emails = get_connection().send_messages(messages) or 0
+        result.flagged = len(requisitions)
+
+    return result
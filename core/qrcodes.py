@@ -0,0 +1,94 @@
+"""
+Server-side QR codes for equipment request links.
+
+Rendered codes only depend on the encoded URL, so they are cached under
+a key derived from it, in their own cache ('qrcodes') so that a large
+label sheet cannot push catalog entries out of the default one.
+"""
+import hashlib
+from io import BytesIO
+
+import segno
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .models import Equipment
+from .search import equipment_search_filter
+
+QR_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+QR_SCALE = 8
+QR_BORDER = 2
+QR_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+# Labels per sheet in the web view; larger sets go through the
+# render_labels command
+LABEL_SHEET_SIZE = 500
+
+
+def equipment_request_url(base_url, equipment_id):
+    """
+    Absolute URL of the request page a QR code points at, e.g.
+    https://host/request/12/
+    """
+    return base_url.rstrip('/') + reverse('equipment_request', args=[equipment_id])
+
+
+def qr_cache_key(data, fmt, scale=QR_SCALE):
+    digest = hashlib.sha1(data.encode()).hexdigest()
+    return f'qr:{fmt}:{scale}:{digest}'
+
+
+def render_qr(data, fmt='png', scale=QR_SCALE):
+    """
+    Returns the QR code for `data` as PNG bytes, a standalone SVG document
+    (fmt='svg') or an SVG element for embedding in HTML (fmt='svg-inline').
+    """
+    cache = caches['qrcodes']
+    key = qr_cache_key(data, fmt, scale)
+    rendered = cache.get(key)
+    if rendered is None:
+        qr = segno.make(data, error='m')
+        if fmt == 'svg-inline':
+            rendered = qr.svg_inline(scale=scale, border=QR_BORDER, omitsize=True)
+        else:
+            buffer = BytesIO()
+            qr.save(buffer, kind=fmt, scale=scale, border=QR_BORDER)
+            rendered = buffer.getvalue()
+        cache.set(key, rendered, QR_CACHE_TIMEOUT)
+    return rendered
+
+
+def label_equipment(query='', category=None, status=None):
+    """
+    Equipment to print labels for, filtered like the equipment list.
+    `category` may be a Category id or name.
+    """
+    equipment_list = Equipment.objects.all()
+    if query:
+        equipment_list = equipment_list.filter(equipment_search_filter(query))
+    if category:
+        try:
+            equipment_list = equipment_list.filter(category_id=int(category))
+        except ValueError:
+            equipment_list = equipment_list.filter(category__name=category)
+    if status:
+        equipment_list = equipment_list.filter(status=status)
+    return equipment_list.order_by('category__name', 'name', 'pk')
+
+
+def render_label_sheet(equipment_list, base_url, **context):
+    """
+    Renders a printable HTML sheet with one QR label per equipment.
+    Extra keyword arguments are passed to the template.
+    """
+    labels = [
+        {
+            'equipment': equipment,
+            'qr': render_qr(equipment_request_url(base_url, equipment.pk), 'svg-inline'),
+        }
+        for equipment in equipment_list.only('pk', 'name', 'serial_number', 'category__name').select_related('category').iterator(chunk_size=1000)
+    ]
+    return render_to_string('equipment_labels.html', {'labels': labels, **context})
@@ -0,0 +1,110 @@
+"""
+Resized renditions of uploaded equipment images.
+
+Every rendition is stored next to the original with a predictable name
+(``equipment_images/drill.jpg`` -> ``equipment_images/drill.jpg.thumb.webp``),
+so they need no extra columns. The name keeps the original's extension,
+so ``drill.jpg`` and ``drill.png`` never share renditions.
+
+A rendition can be missing: the upload may not decode, or predate the
+build_renditions command. rendition_urls only lists the ones that exist,
+and templates fall back to the original image.
+"""
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# name -> bounding box; images are shrunk to fit, never enlarged
+RENDITION_SIZES = {
+    'thumb': (300, 300),
+    'large': (1024, 1024),
+}
+# extension -> (Pillow format, save options)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+# What generate_renditions raises for a file Pillow can't or won't decode
+RENDITION_ERRORS = (OSError, Image.DecompressionBombError)
+
+
+def rendition_name(image_name, size, ext):
+    return f'{image_name}.{size}.{ext}'
+
+
+def rendition_names(image_name):
+    return [rendition_name(image_name, size, ext) for size in RENDITION_SIZES for ext in RENDITION_FORMATS]
+
+
+def rendition_url(image_name, size='thumb', ext='webp', storage=default_storage):
+    if not image_name:
+        return None
+    return storage.url(rendition_name(image_name, size, ext))
+
+
+def rendition_urls(image_name, storage=default_storage):
+    """
+    URLs of the renditions of an image that exist in storage, keyed like
+    ``thumb_webp``; empty for equipment without an image.
+    """
+    if not image_name:
+        return {}
+    urls = {}
+    for size in RENDITION_SIZES:
+        for ext in RENDITION_FORMATS:
+            name = rendition_name(image_name, size, ext)
+            if storage.exists(name):
+                urls[f'{size}_{ext}'] = storage.url(name)
+    return urls
+
+
+def generate_renditions(image_field, overwrite=False):
+    """
+    Writes every rendition of `image_field` (an ImageFieldFile) to its
+    storage. Existing renditions are kept unless `overwrite` is set.
+    Returns the names that were written.
+    """
+    storage = image_field.storage
+    pending = {
+        (size, ext): rendition_name(image_field.name, size, ext)
+        for size in RENDITION_SIZES
+        for ext in RENDITION_FORMATS
+    }
+    if not overwrite:
+        pending = {key: name for key, name in pending.items() if not storage.exists(name)}
+    if not pending:
+        return []
+
+    image_field.open('rb')
+    try:
+        with Image.open(image_field) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+            written = []
+            for (size, ext), name in pending.items():
+                image = original.copy()
+                image.thumbnail(RENDITION_SIZES[size], Image.LANCZOS)
+                pil_format, options = RENDITION_FORMATS[ext]
+                if pil_format == 'JPEG' and image.mode != 'RGB':
+                    image = image.convert('RGB')
+
+                buffer = BytesIO()
+                image.save(buffer, pil_format, **options)
+                if storage.exists(name):
+                    storage.delete(name)
+                written.append(storage.save(name, ContentFile(buffer.getvalue())))
+            return written
+    finally:
+        image_field.close()
+
+
+def delete_renditions(image_name, storage=default_storage):
+    for name in rendition_names(image_name):
+        if storage.exists(name):
+            storage.delete(name)
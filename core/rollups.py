@@ -0,0 +1,165 @@
+"""
+Daily requisition rollups.
+
+RequisitionDailyStat keeps one row per (day, category, status) with the
+number of requisitions and units requested, so reports over long date
+ranges read a few hundred rollup rows instead of every requisition.
+
+Rows are kept current by the signals in models.py. Writes that skip
+signals (bulk_create / bulk_update) must call record_requisition_changes
+themselves, and queryset deletes models.forget_requisitions; the
+rebuild_daily_stats command recomputes everything from the Requisition
+table if the two ever drift apart.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Equipment, Requisition, RequisitionDailyStat
+
+
+def apply_stat_deltas(deltas):
+    """
+    Adds `deltas`, mapping (day, category_id, status) -> [count, quantity],
+    to the rollup table. Negative values remove.
+    """
+    for (day, category_id, status), (count, quantity) in deltas.items():
+        if not count and not quantity:
+            continue
+        lookup = {'day': day, 'category_id': category_id, 'status': status}
+        increment = {
+            'requisition_count': F('requisition_count') + count,
+            'quantity': F('quantity') + quantity,
+        }
+        if RequisitionDailyStat.objects.filter(**lookup).update(**increment) or count < 0:
+            # Nothing to take away from a missing row (e.g. its category is being deleted)
+            continue
+        try:
+            with transaction.atomic():
+                RequisitionDailyStat.objects.create(**lookup, requisition_count=count, quantity=quantity)
+        except IntegrityError:
+            # Another request created the row first
+            RequisitionDailyStat.objects.filter(**lookup).update(**increment)
+
+
+def rollup_row(requisition):
+    return (requisition.date, requisition.equipment_id, requisition.status, requisition.quantity)
+
+
+def record_requisition_changes(changes):
+    """
+    Updates the rollups for a batch of requisition writes. Each change is a
+    (previous, current) pair of (date, equipment_id, status, quantity)
+    tuples; previous is None for new requisitions and current is None for
+    deleted ones.
+    """
+    changes = [(previous, current) for previous, current in changes if previous != current]
+    if not changes:
+        return
+
+    equipment_ids = {row[1] for change in changes for row in change if row}
+    categories = dict(Equipment.objects.filter(pk__in=equipment_ids).values_list('pk', 'category_id'))
+
+    deltas = defaultdict(lambda: [0, 0])
+    for previous, current in changes:
+        for row, sign in ((previous, -1), (current, 1)):
+            if row is None:
+                continue
+            date, equipment_id, status, quantity = row
+            if equipment_id not in categories:
+                continue
+            delta = deltas[(timezone.localdate(date), categories[equipment_id], status)]
+            delta[0] += sign
+            delta[1] += sign * quantity
+    apply_stat_deltas(deltas)
+
+
+def record_requisition_change(previous, current):
+    record_requisition_changes([(previous, current)])
+
+
+def requisition_stat_rows(requisitions):
+    """
+    Aggregates a Requisition queryset by local day, category and status.
+    """
+    return (
+        requisitions.annotate(day=TruncDate('date'))
+        .values('day', 'status', category_id=F('equipment__category_id'))
+        .annotate(requisition_count=Count('id'), total_quantity=Sum('quantity'))
+        .order_by()
+    )
+
+
+def remove_requisition_stats(requisitions):
+    """
+    Subtracts a Requisition queryset from the rollups with one aggregate
+    query; call it before deleting the rows.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for row in requisition_stat_rows(requisitions):
+        delta = deltas[(row['day'], row['category_id'], row['status'])]
+        delta[0] -= row['requisition_count']
+        delta[1] -= row['total_quantity']
+    apply_stat_deltas(deltas)
+
+
+def move_equipment_stats(equipment_id, old_category_id, new_category_id):
+    """
+    Moves an equipment's requisitions from one category's rollups to
+    another's after the equipment is re-categorised.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for row in requisition_stat_rows(Requisition.objects.filter(equipment_id=equipment_id)):
+        for category_id, sign in ((old_category_id, -1), (new_category_id, 1)):
+            delta = deltas[(row['day'], category_id, row['status'])]
+            delta[0] += sign * row['requisition_count']
+            delta[1] += sign * row['total_quantity']
+    apply_stat_deltas(deltas)
+
+
+def rebuild_daily_stats(batch_size=1000):
+    """
+    Recomputes the whole rollup table from Requisition in one transaction.
+    Returns the number of rollup rows written.
+    """
+    stats = [
+        RequisitionDailyStat(
+            day=row['day'],
+            category_id=row['category_id'],
+            status=row['status'],
+            requisition_count=row['requisition_count'],
+            quantity=row['total_quantity'],
+        )
+        for row in requisition_stat_rows(Requisition.objects.all()).iterator(chunk_size=batch_size)
+    ]
+    with transaction.atomic():
+        RequisitionDailyStat.objects.all().delete()
+        RequisitionDailyStat.objects.bulk_create(stats, batch_size=batch_size)
+    return len(stats)
+
+
+def category_summary(start_date=None, end_date=None, category=None):
+    """
+    Requisitions and units per category over a date range, with a count per
+    status, read from the rollups.
+    """
+    stats = RequisitionDailyStat.objects.all()
+    if start_date:
+        stats = stats.filter(day__gte=start_date)
+    if end_date:
+        stats = stats.filter(day__lte=end_date)
+    if category:
+        stats = stats.filter(category=category)
+
+    per_status = {
+        status.lower(): Sum('requisition_count', filter=Q(status=status), default=0)
+        for status, _ in Requisition.STATUS_CHOICES
+    }
+    return (
+        stats.values('category_id', category_name=F('category__name'))
+        .annotate(requisitions=Sum('requisition_count'), total_quantity=Sum('quantity'), **per_status)
+        .order_by('category_name')
+    )
@@ -0,0 +1,131 @@
+"""
+Read replicas.
+
+PrimaryReplicaRouter sends reads to one of settings.DATABASE_REPLICAS, but
+only inside views marked with @replica_reads (reports, search, listings,
+exports); everything else, and every write, uses the primary. Outside a
+request (management commands, the overdue sweeper) nothing is routed to a
+replica.
+
+Read-your-writes: once a request writes to the primary, the rest of it
+reads from the primary too, and ReplicaRoutingMiddleware sets a cookie
+that keeps that browser on the primary for DATABASE_REPLICA_LAG seconds,
+long enough for the replicas to catch up.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'db_primary'
+# Sessions hold the cart and are saved after the view has run, so they are
+# always read where they were written
+PRIMARY_APP_LABELS = {'sessions'}
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+@contextmanager
+def request_routing(pinned=False):
+    """
+    Tracks the routing of one request; yields its RoutingState.
+    """
+    state = RoutingState(pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def replica_alias():
+    state = _state.get()
+    if state is None or not state.replica_reads or state.pinned or state.wrote or not settings.DATABASE_REPLICAS:
+        return DEFAULT_DB_ALIAS
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Reads inside the block go to the primary, e.g. when their result is
+    cached for longer than a replica can lag.
+    """
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    pinned, state.pinned = state.pinned, True
+    try:
+        yield
+    finally:
+        state.pinned = pinned
+
+
+def replica_reads(view_func):
+    """
+    Lets the reads of `view_func` go to a replica. The view should not
+    write, or only write after its reads: the first write moves the rest
+    of the request to the primary.
+    """
+    def enable():
+        state = _state.get()
+        if state is not None:
+            state.replica_reads = True
+        return state
+
+    def disable(state):
+        if state is not None:
+            state.replica_reads = False
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            state = enable()
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                disable(state)
+    else:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            state = enable()
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                disable(state)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APP_LABELS:
+            return DEFAULT_DB_ALIAS
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
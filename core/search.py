@@ -0,0 +1,72 @@
+"""
+Equipment search backend.
+
+On PostgreSQL, matches are ranked with full-text search and the substring
+filters are served by the trigram indexes from migration 0007. Other
+databases (SQLite in tests) fall back to plain icontains filtering.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Q
+
+from .models import Category
+
+# Must match the expression indexed in migration 0007 for PostgreSQL to use it
+SEARCH_CONFIG = 'simple'
+
+
+def equipment_search_vector():
+    return SearchVector('name', 'serial_number', config=SEARCH_CONFIG)
+
+
+def equipment_search_filter(query, category_ids=None):
+    """
+    Substring match on name, serial number and category name. Django compiles
+    icontains to UPPER(col) LIKE UPPER(...) on PostgreSQL, which is exactly
+    what the UPPER(col) gin_trgm_ops indexes cover.
+
+    Matching categories are resolved up front (the table is small) so every
+    branch of the OR is on core_equipment and can be combined as a bitmap
+    OR instead of forcing a scan of the join.
+    """
+    if category_ids is None:
+        category_ids = list(matching_categories(query))
+    return (
+        Q(name__icontains=query) |
+        Q(serial_number__icontains=query) |
+        Q(category_id__in=category_ids)
+    )
+
+
+def matching_categories(query):
+    return Category.objects.filter(name__icontains=query).values_list('pk', flat=True)
+
+
+def search_equipment(queryset, query, category_ids=None):
+    """
+    Filters `queryset` by `query` and orders it by relevance, newest first
+    among equal matches.
+    """
+    if not query:
+        return queryset.order_by('-pk')
+
+    if connection.vendor != 'postgresql':
+        return queryset.filter(equipment_search_filter(query, category_ids)).order_by('-pk')
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.annotate(
+        search=equipment_search_vector(),
+    ).filter(
+        Q(search=search_query) | equipment_search_filter(query, category_ids)
+    ).annotate(
+        rank=SearchRank(equipment_search_vector(), search_query),
+    ).order_by('-rank', '-pk')
+
+
+async def asearch_equipment(queryset, query):
+    """
+    search_equipment() for async views: the matching categories are looked
+    up with the async ORM before the (lazy) queryset is built.
+    """
+    category_ids = [pk async for pk in matching_categories(query)] if query else None
+    return search_equipment(queryset, query, category_ids)
@@ -0,0 +1,319 @@
+"""
+Synthetic data at production volume, for reproducing performance locally.
+
+seed_data() fills the database with categories, equipment, users (with
+their UserProfile) and requisitions. Every value is drawn from
+random.Random(seed) relative to a fixed last day, so the same arguments
+always produce the same rows.
+
+Requisitions are spread over the period with more of them recently and
+few at weekends, and their status follows their age: recent ones are
+mostly pending, older ones mostly returned, with rejections, late
+returns and some loans still out (and overdue).
+
+Rows are written in chunks: bulk_create for the smaller tables;
+requisitions go through COPY on PostgreSQL with psycopg 3 and a plain
+executemany INSERT elsewhere. Users share one
+password hash and their profiles are inserted in bulk rather than by the
+create_user_profile signal, which costs an extra INSERT per user. Bulk
+writes send no signals, so the rollups, dashboard counters and catalog
+cache are refreshed at the end.
+"""
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Category, Equipment, Requisition, UserProfile, invalidate_dashboard_counts
+from .rollups import rebuild_daily_stats
+
+SEED_CHUNK_SIZE = 10000
+# Every seeded user can log in with this password
+SEED_PASSWORD = 'seed-password'
+
+CATEGORY_NAMES = [
+    'Laptop', 'Monitor', 'Projector', 'Camera', 'Microphone', 'Speaker', 'Tablet', 'Printer',
+    'Scanner', 'Docking Station', 'Keyboard', 'Mouse', 'Headset', 'Webcam', 'Router', 'Switch',
+    'Access Point', 'Tripod', 'Lighting Kit', 'Extension Cord',
+]
+BRANDS = ['Dell', 'HP', 'Lenovo', 'Apple', 'Asus', 'Acer', 'Logitech', 'Epson', 'Canon', 'Sony', 'Samsung', 'Cisco']
+EQUIPMENT_STATUSES = ['AVAILABLE', 'MAINTENANCE', 'DAMAGED', 'LOST']
+EQUIPMENT_STATUS_WEIGHTS = [92, 4, 2, 2]
+
+FIRST_NAMES = ['Somchai', 'Suda', 'Anan', 'Malee', 'Niran', 'Pim', 'Krit', 'Ploy', 'Wichai', 'Nok', 'Arthit', 'Kanya']
+LAST_NAMES = ['Srisuk', 'Wongsa', 'Chaiyo', 'Boonmee', 'Thongdee', 'Saetang', 'Rattana', 'Kaewsai', 'Phromma', 'Jaidee']
+COMPANIES = ['Head Office', 'Hospital', 'Clinic']
+BRANCHES = ['Bangkok', 'Chiang Mai', 'Khon Kaen', 'Phuket', 'Hat Yai']
+DEPARTMENTS = ['IT', 'Finance', 'HR', 'Marketing', 'Nursing', 'Radiology', 'Pharmacy', 'Laboratory', 'Administration']
+
+REASONS = ['Meeting', 'Training session', 'Presentation', 'Work from home', 'Site visit', 'Event', 'Replacement while in repair', '']
+REJECT_REASONS = ['Out of stock', 'Not approved by department head', 'Duplicate request', 'Reserved for another event']
+LOAN_DAYS = [1, 1, 2, 3, 3, 5, 7, 7, 14, 30]
+QUANTITIES = [1, 2, 3, 5]
+QUANTITY_WEIGHTS = [80, 12, 5, 3]
+
+REQUISITION_STATUSES = ['PENDING', 'APPROVED', 'REJECTED', 'RETURNED']
+REQUISITION_COLUMNS = [
+    'user_id', 'equipment_id', 'quantity', 'date', 'status', 'reason', 'return_date', 'actual_return_date',
+    'approve_date', 'reject_date', 'reject_reason', 'approved_by_id', 'rejected_by_id', 'received_by_id',
+    'overdue_notified_at', 'updated_at',
+]
+REQUISITION_DATETIME_COLUMNS = {
+    'date', 'return_date', 'actual_return_date', 'approve_date', 'reject_date', 'overdue_notified_at', 'updated_at',
+}
+
+
+class SeedResult:
+    def __init__(self):
+        self.rows = Counter()  # model name -> rows written
+        self.elapsed = Counter()  # model name -> seconds
+
+    @property
+    def total_rows(self):
+        return sum(self.rows.values())
+
+    @property
+    def total_elapsed(self):
+        return sum(self.elapsed.values())
+
+    @contextmanager
+    def timing(self, name):
+        start = time.perf_counter()
+        yield
+        self.elapsed[name] += time.perf_counter() - start
+
+
+def skewed(rng, items, power):
+    # Low indexes come up more often: a few busy borrowers and popular items
+    return items[int(len(items) * rng.random() ** power)]
+
+
+def requisition_status(rng, age_days):
+    if age_days < 2:
+        weights = [60, 30, 10, 0]
+    elif age_days < 30:
+        weights = [3, 25, 10, 62]
+    else:
+        weights = [1, 2, 10, 87]
+    return rng.choices(REQUISITION_STATUSES, weights)[0]
+
+
+def requisition_row(rng, end, days, user_ids, staff_ids, equipment_ids):
+    """
+    One requisition as a tuple of REQUISITION_COLUMNS values, requested
+    in the `days` days before `end`.
+    """
+    day = (end - timedelta(days=int(days * rng.random() ** 1.5) + 1)).date()
+    if day.weekday() >= 5 and rng.random() < 0.8:
+        day -= timedelta(days=day.weekday() - 4)
+    date = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=rng.triangular(8, 18, 10))
+    status = requisition_status(rng, (end - date) / timedelta(days=1))
+
+    return_date = actual_return_date = approve_date = reject_date = None
+    approved_by = rejected_by = received_by = overdue_notified_at = None
+    reject_reason = ''
+    decided = min(date + timedelta(hours=rng.expovariate(1 / 6)), end)
+    if status in ('APPROVED', 'RETURNED'):
+        approve_date, approved_by = decided, rng.choice(staff_ids)
+        return_date = approve_date + timedelta(days=rng.choice(LOAN_DAYS))
+        if status == 'RETURNED':
+            # Mostly on time or early, with a tail of late returns
+            returned = return_date + timedelta(days=rng.gauss(-0.5, 2))
+            actual_return_date = min(max(returned, approve_date + timedelta(hours=1)), end)
+            received_by = rng.choice(staff_ids)
+        elif return_date + timedelta(days=1) < end:
+            overdue_notified_at = return_date + timedelta(days=1)
+    elif status == 'REJECTED':
+        reject_date, rejected_by, reject_reason = decided, rng.choice(staff_ids), rng.choice(REJECT_REASONS)
+
+    updated_at = max(value for value in (date, approve_date, reject_date, actual_return_date, overdue_notified_at) if value)
+    return (
+        skewed(rng, user_ids, 2), skewed(rng, equipment_ids, 1.5), rng.choices(QUANTITIES, QUANTITY_WEIGHTS)[0],
+        date, status, rng.choice(REASONS), return_date, actual_return_date,
+        approve_date, reject_date, reject_reason, approved_by, rejected_by, received_by,
+        overdue_notified_at, updated_at,
+    )
+
+
+def requisition_rows(rng, count, end, days, user_ids, staff_ids, equipment_ids):
+    for _ in range(count):
+        yield requisition_row(rng, end, days, user_ids, staff_ids, equipment_ids)
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def can_copy():
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    return is_psycopg3
+
+
+def copy_requisitions(rows):
+    columns = ', '.join(connection.ops.quote_name(column) for column in REQUISITION_COLUMNS)
+    sql = f'COPY {connection.ops.quote_name(Requisition._meta.db_table)} ({columns}) FROM STDIN'
+    with connection.cursor() as cursor, cursor.cursor.copy(sql) as copy:
+        for row in rows:
+            copy.write_row(row)
+
+
+def insert_requisitions(rows):
+    # A plain executemany: bulk_create spends most of its time preparing
+    # each value through the model fields
+    adapt = connection.ops.adapt_datetimefield_value
+    dates = [i for i, column in enumerate(REQUISITION_COLUMNS) if column in REQUISITION_DATETIME_COLUMNS]
+    columns = ', '.join(connection.ops.quote_name(column) for column in REQUISITION_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(REQUISITION_COLUMNS))
+    sql = f'INSERT INTO {connection.ops.quote_name(Requisition._meta.db_table)} ({columns}) VALUES ({placeholders})'
+    rows = [list(row) for row in rows]
+    for row in rows:
+        for i in dates:
+            row[i] = adapt(row[i])
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def seed_users(rng, result, prefix, count, is_staff, end, days, chunk_size):
+    password = make_password(SEED_PASSWORD)
+    user_ids = []
+    for offset in range(0, count, chunk_size):
+        users, profiles = [], []
+        for i in range(offset, min(offset + chunk_size, count)):
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            username = f'{prefix}-{"staff" if is_staff else "user"}-{i:07d}'
+            users.append(User(
+                username=username,
+                first_name=first_name,
+                last_name=last_name,
+                email=f'{username}@example.com',
+                password=password,
+                # Integer flags, as stored in auth_user (see core.views)
+                is_staff=int(is_staff),
+                is_active=1,
+                is_superuser=0,
+                date_joined=end - timedelta(days=days * (1 + rng.random())),
+            ))
+            profiles.append(UserProfile(
+                company=rng.choice(COMPANIES),
+                branch=rng.choice(BRANCHES),
+                department='IT' if is_staff else rng.choice(DEPARTMENTS),
+                employee_id=f'{prefix.upper()}{"S" if is_staff else "E"}{i:07d}',
+            ))
+        with result.timing('User'):
+            users = User.objects.bulk_create(users)
+        for user, profile in zip(users, profiles):
+            profile.user = user
+        with result.timing('UserProfile'):
+            UserProfile.objects.bulk_create(profiles)
+        result.rows['User'] += len(users)
+        result.rows['UserProfile'] += len(profiles)
+        user_ids.extend(user.pk for user in users)
+    return user_ids
+
+
+def seed_catalog(rng, result, prefix, categories, equipment, end, days, chunk_size):
+    names = [
+        CATEGORY_NAMES[i % len(CATEGORY_NAMES)] + (f' {i // len(CATEGORY_NAMES) + 1}' if i >= len(CATEGORY_NAMES) else '')
+        for i in range(categories)
+    ]
+    with result.timing('Category'):
+        categories = Category.objects.bulk_create([Category(name=name) for name in names])
+    result.rows['Category'] += len(categories)
+
+    items = []
+    for offset in range(0, equipment, chunk_size):
+        chunk, updated = [], []
+        for i in range(offset, min(offset + chunk_size, equipment)):
+            category = skewed(rng, categories, 1.5)
+            total = rng.choice([1, 1, 1, 2, 3, 5, 10, 20])
+            chunk.append(Equipment(
+                name=f'{rng.choice(BRANDS)} {category.name} {rng.randint(100, 9999)}',
+                category=category,
+                total_quantity=total,
+                available_quantity=total,
+                description='',
+                serial_number=f'{prefix.upper()}-{i:08d}',
+                status=rng.choices(EQUIPMENT_STATUSES, EQUIPMENT_STATUS_WEIGHTS)[0],
+            ))
+            updated.append(end - timedelta(days=days * rng.random()))
+        with result.timing('Equipment'):
+            chunk = Equipment.objects.bulk_create(chunk)
+            # bulk_create stamps auto_now fields with the current time;
+            # bulk_update writes them as given, in one UPDATE per chunk
+            for item, updated_at in zip(chunk, updated):
+                item.updated_at = updated_at
+            Equipment.objects.bulk_update(chunk, ['updated_at'], batch_size=chunk_size)
+            items.extend(chunk)
+        result.rows['Equipment'] += len(chunk)
+    return items
+
+
+def seed_data(
+    requisitions, users=5000, staff=20, equipment=20000, categories=50, days=730,
+    seed=0, until=None, chunk_size=SEED_CHUNK_SIZE, use_copy=None, progress=None,
+):
+    """
+    Writes the dataset and returns a SeedResult. Usernames and serial
+    numbers carry a 'seed<seed>' prefix, so datasets from different seeds
+    can share a database; seeding the same one twice fails on the unique
+    usernames. Requisitions are committed chunk by chunk, and
+    `progress(rows_written)` is called after each one.
+    """
+    rng = random.Random(seed)
+    until = until or timezone.localdate()
+    end = timezone.make_aware(datetime.combine(until + timedelta(days=1), datetime.min.time()))
+    prefix = f'seed{seed}'
+    use_copy = can_copy() if use_copy is None else use_copy
+    result = SeedResult()
+
+    with transaction.atomic():
+        staff_ids = seed_users(rng, result, prefix, staff, True, end, days, chunk_size)
+        user_ids = seed_users(rng, result, prefix, users, False, end, days, chunk_size)
+        items = seed_catalog(rng, result, prefix, categories, equipment, end, days, chunk_size)
+
+    # Units still out on loan, to make available_quantity consistent
+    equipment_ids = [item.pk for item in items]
+    outstanding = Counter()
+    rows = requisition_rows(rng, requisitions, end, days, user_ids, staff_ids, equipment_ids)
+    for chunk in chunks(rows, chunk_size):
+        for row in chunk:
+            if row[4] == 'APPROVED':
+                outstanding[row[1]] += row[2]
+        with result.timing('Requisition'), transaction.atomic():
+            if use_copy:
+                copy_requisitions(chunk)
+            else:
+                insert_requisitions(chunk)
+        result.rows['Requisition'] += len(chunk)
+        if progress:
+            progress(result.rows['Requisition'])
+
+    on_loan = [item for item in items if outstanding[item.pk]]
+    for item in on_loan:
+        item.total_quantity = max(item.total_quantity, outstanding[item.pk])
+        item.available_quantity = item.total_quantity - outstanding[item.pk]
+    with result.timing('Equipment'), transaction.atomic():
+        Equipment.objects.bulk_update(on_loan, ['total_quantity', 'available_quantity'], batch_size=chunk_size)
+
+    with result.timing('RequisitionDailyStat'):
+        result.rows['RequisitionDailyStat'] += rebuild_daily_stats()
+    invalidate_dashboard_counts(user_ids + staff_ids)
+    bump_catalog_version()
+    return result
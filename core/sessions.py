@@ -0,0 +1,42 @@
+"""
+Database session store with coalesced expiry refreshes.
+
+With SESSION_SAVE_EVERY_REQUEST every request rewrote its django_session
+row just to push expire_date forward. This store remembers the row's
+expire_date when it is loaded, and core.middleware.SessionMiddleware only
+saves an unmodified session once it is more than SESSION_REFRESH_INTERVAL
+seconds into its lifetime. Expiry still slides with activity; an idle
+session can lapse at most SESSION_REFRESH_INTERVAL seconds early.
+
+Enable with SESSION_ENGINE = 'core.sessions'.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+DEFAULT_REFRESH_INTERVAL = 5 * 60
+
+
+class SessionStore(DBStore):
+    expire_date = None
+
+    def _get_session_from_db(self):
+        session = super()._get_session_from_db()
+        self.expire_date = session.expire_date if session else None
+        return session
+
+    async def _aget_session_from_db(self):
+        session = await super()._aget_session_from_db()
+        self.expire_date = session.expire_date if session else None
+        return session
+
+    def refresh_due(self):
+        """
+        True if the stored expiry is more than SESSION_REFRESH_INTERVAL
+        seconds behind where a save now would put it.
+        """
+        if self.expire_date is None:
+            return False
+        interval = getattr(settings, 'SESSION_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL)
+        return self.get_expiry_date() - self.expire_date > timedelta(seconds=interval)
@@ -0,0 +1,110 @@
+"""
+Production static files.
+
+`collectstatic` writes every file under a content-hashed name (through
+Django's ManifestStaticFilesStorage) plus pre-compressed .gz and, when
+the Brotli package is installed, .br variants next to it.
+core.middleware.StaticFilesMiddleware then serves them from STATIC_ROOT
+with far-future Cache-Control, so browsers never revalidate them: a
+changed file gets a new name.
+"""
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ttf', '.eot', '.otf'}
+COMPRESS_MIN_SIZE = 256
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unhashed names (files referenced without {% static %}) are revalidated
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+
+def compressed_variants(path):
+    """
+    Writes path.gz (and path.br) next to `path` if it is a text file that
+    compresses to something smaller. Returns the names written.
+    """
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return []
+
+    encoders = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+    written = []
+    for suffix, encode in encoders:
+        compressed = encode(data)
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # No manifest before collectstatic has run (development, tests): use the plain name
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in {*paths, *self.hashed_files.values()}:
+            if self.exists(name):
+                compressed_variants(self.path(name))
+
+
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def serve_static(request, name, immutable_names):
+    """
+    Response for the collected static file `name`, or None if there is no
+    such file. Picks the smallest variant the client accepts.
+    """
+    try:
+        path = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+
+    content_type, _ = mimetypes.guess_type(name)
+    accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    encoding = None
+    for candidate, suffix in ENCODINGS:
+        if candidate in accepted and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+
+    stat = os.stat(path)
+    if name not in immutable_names and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if name in immutable_names else REVALIDATE_CACHE_CONTROL
+    return response
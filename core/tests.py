@@ -1,3 +1,1489 @@
-from django.test import TestCase
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.db import OperationalError, connection, connections, models, transaction
+from django.db.models.deletion import Collector
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from .catalog import CATALOG_HITS_KEY, CATALOG_MISSES_KEY, bump_catalog_version, catalog_stats, reset_catalog_stats
+from .forms import EquipmentForm, EquipmentImportForm
+from .models import (
+    DASHBOARD_COUNTS_KEY, Category, Equipment, Requisition, RequisitionDailyStat, UserProfile, dashboard_user_counts_key,
+)
+from .overdue import SweepResult, sweep_overdue
+from .qrcodes import equipment_request_url, qr_cache_key
+from .renditions import rendition_names
 
 # Create your tests here.
+
+class EquipmentDataTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='secret')
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name='Laptop')
+
+    def add_equipment(self, count, start=0):
+        Equipment.objects.bulk_create([
+            Equipment(
+                name=f'Item {i:05d}',
+                category=self.category,
+                total_quantity=5,
+                available_quantity=5,
+                serial_number=f'SN-{i:05d}',
+            )
+            for i in range(start, start + count)
+        ])
+        bump_catalog_version()
+
+    def fetch(self, **params):
+        params.setdefault('draw', 1)
+        params.setdefault('start', 0)
+        params.setdefault('length', 10)
+        return self.client.get(reverse('equipment_data'), params)
+
+    def test_returns_requested_page_only(self):
+        self.add_equipment(25)
+        data = self.fetch(start=10).json()
+        self.assertEqual(data['recordsTotal'], 25)
+        self.assertEqual(data['recordsFiltered'], 25)
+        self.assertEqual(len(data['data']), 10)
+        self.assertEqual(data['data'][0]['category'], 'Laptop')
+
+    def test_search_and_ordering(self):
+        self.add_equipment(30)
+        data = self.fetch(**{
+            'search[value]': 'SN-0001',
+            'order[0][column]': 0,
+            'order[0][dir]': 'asc',
+        }).json()
+        self.assertEqual(data['recordsFiltered'], 10)
+        names = [row['name'] for row in data['data']]
+        self.assertEqual(names, sorted(names))
+
+    def test_length_is_capped(self):
+        self.add_equipment(150)
+        data = self.fetch(length=-1).json()
+        self.assertEqual(len(data['data']), 100)
+
+    def test_constant_queries_and_size_as_catalog_grows(self):
+        self.add_equipment(20)
+        with CaptureQueriesContext(connection) as small_queries:
+            small = self.fetch()
+        self.add_equipment(2000, start=20)
+        with CaptureQueriesContext(connection) as large_queries:
+            large = self.fetch()
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(len(small.json()['data']), len(large.json()['data']))
+        self.assertLess(abs(len(large.content) - len(small.content)), 100)
+
+
+class RequisitionKeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='approver', password='secret', is_staff=True)
+        self.client.force_login(self.staff)
+        category = Category.objects.create(name='Camera')
+        self.equipment = Equipment.objects.create(name='Camera', category=category, total_quantity=1, available_quantity=1)
+        Requisition.objects.bulk_create([
+            Requisition(
+                user=self.staff,
+                equipment=self.equipment,
+                status='PENDING' if i % 3 == 0 else 'RETURNED',
+            )
+            for i in range(120)
+        ])
+        # Identical timestamps force the id tie-breaker in the (date, id) key
+        Requisition.objects.update(date=timezone.now())
+
+    def walk(self, url_name, **params):
+        seen = []
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(url_name), params)
+            self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+            seen.extend(req.id for req in response.context['requisitions'])
+            if not response.context['next_cursor']:
+                return seen
+            params['cursor'] = response.context['next_cursor']
+
+    def test_manage_requests_visits_every_row_once(self):
+        seen = self.walk('manage_requests')
+        self.assertEqual(seen, list(Requisition.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_my_requests_visits_every_row_once(self):
+        seen = self.walk('my_requests')
+        self.assertEqual(seen, list(Requisition.objects.order_by('-date', '-id').values_list('id', flat=True)))
+
+    def test_status_filter(self):
+        seen = self.walk('manage_requests', status='PENDING')
+        self.assertEqual(len(seen), 40)
+        self.assertEqual(set(Requisition.objects.filter(id__in=seen).values_list('status', flat=True)), {'PENDING'})
+
+    def test_malformed_cursor_restarts_from_first_page(self):
+        response = self.client.get(reverse('manage_requests'), {'cursor': '!!not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['requisitions'][0].id, Requisition.objects.order_by('-id')[0].id)
+
+
+class RequisitionQueryCountTests(TestCase):
+    """
+    Guards against N+1 queries: a listing must issue the same number of
+    queries whether it shows a handful of rows or a full page.
+    """
+    def setUp(self):
+        self.staff = User.objects.create_user(username='approver', password='secret', is_staff=True)
+        self.client.force_login(self.staff)
+        self.category = Category.objects.create(name='Projector')
+
+    def add_requisitions(self, count):
+        for i in range(count):
+            borrower = User.objects.create_user(username=f'borrower{Requisition.objects.count()}', first_name='B')
+            equipment = Equipment.objects.create(name=f'Projector {i}', category=self.category)
+            Requisition.objects.create(
+                user=borrower,
+                equipment=equipment,
+                status='APPROVED',
+                approved_by=self.staff,
+            )
+
+    def fetch(self, url, params=None):
+        response = self.client.get(url, params)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def assertConstantQueries(self, url, params=None):
+        self.add_requisitions(2)
+        with CaptureQueriesContext(connection) as few:
+            self.fetch(url, params)
+        self.add_requisitions(20)
+        with self.assertNumQueries(len(few)):
+            content = self.fetch(url, params)
+        return content
+
+    def test_manage_requests(self):
+        self.assertConstantQueries(reverse('manage_requests'))
+
+    def test_my_requests(self):
+        self.client.force_login(User.objects.create_user(username='owner'))
+        owner = User.objects.get(username='owner')
+        equipment = Equipment.objects.create(name='Screen', category=self.category)
+
+        def add_own(count):
+            for _ in range(count):
+                Requisition.objects.create(user=owner, equipment=equipment, status='APPROVED', approved_by=self.staff)
+
+        add_own(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('my_requests'))
+        add_own(20)
+        with self.assertNumQueries(len(few)):
+            self.client.get(reverse('my_requests'))
+
+    def test_request_report(self):
+        self.assertConstantQueries(reverse('request_report'), {'start_date': ''})
+
+    def test_request_report_csv(self):
+        content = self.assertConstantQueries(reverse('request_report'), {'export': 'csv'})
+        self.assertEqual(len(content.decode().strip().splitlines()), 23)
+
+
+class RequestReportCsvTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='approver', password='secret', is_staff=True)
+        self.client.force_login(self.staff)
+        category = Category.objects.create(name='Audio')
+        self.equipment = Equipment.objects.create(name='Mic, wireless', category=category)
+
+    def test_streams_rows_with_resolved_columns(self):
+        requisition = Requisition.objects.create(user=self.staff, equipment=self.equipment, quantity=2, status='APPROVED')
+        response = self.client.get(reverse('request_report'), {'export': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="requisition_report.csv"')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'ID,Equipment,Quantity,User,Request Date,Approve Date,Reject Date,Returned Date,Status')
+        self.assertEqual(
+            lines[1],
+            f'{requisition.pk},"Mic, wireless",2,approver,{requisition.date:%Y-%m-%d %H:%M},-,-,-,Approved',
+        )
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='approver', password='secret', is_staff=True)
+        self.client.force_login(self.staff)
+        category = Category.objects.create(name='Tablet')
+        self.equipment = Equipment.objects.create(name='Tablet', category=category, total_quantity=3, available_quantity=3)
+
+    def request_units(self, quantity):
+        return self.client.post(reverse('equipment_request', args=[self.equipment.pk]), {'quantity': quantity, 'reason': 'Meeting'})
+
+    def test_request_deducts_stock(self):
+        response = self.request_units(2)
+        self.assertRedirects(response, reverse('my_requests'), fetch_redirect_response=False)
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.available_quantity, 1)
+
+    def test_request_over_stock_is_refused(self):
+        response = self.request_units(4)
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'quantity', 'Only 3 items available.')
+        self.assertFalse(Requisition.objects.exists())
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.available_quantity, 3)
+
+    def test_reject_twice_restores_stock_once(self):
+        self.request_units(2)
+        requisition = Requisition.objects.get()
+        url = reverse('reject_request', args=[requisition.pk])
+        self.client.post(url, {'reject_reason': 'No'})
+        self.client.post(url, {'reject_reason': 'No'})
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.available_quantity, 3)
+
+    def test_receive_twice_restores_stock_once(self):
+        self.request_units(2)
+        requisition = Requisition.objects.get()
+        self.client.get(reverse('approve_request', args=[requisition.pk]))
+        self.client.get(reverse('receive_request', args=[requisition.pk]))
+        self.client.get(reverse('receive_request', args=[requisition.pk]))
+        self.equipment.refresh_from_db()
+        self.assertEqual(self.equipment.available_quantity, 3)
+
+
+class ConcurrentStockReservationTests(TransactionTestCase):
+    STOCK = 50
+    THREADS = 200
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='borrower', password='secret')
+        category = Category.objects.create(name='Cable')
+        self.equipment = Equipment.objects.create(
+            name='HDMI cable', category=category, total_quantity=self.STOCK, available_quantity=self.STOCK,
+        )
+
+    def test_stock_is_never_oversold(self):
+        url = reverse('equipment_request', args=[self.equipment.pk])
+        self.client.force_login(self.user)
+        session_cookie = self.client.cookies
+        barrier = threading.Barrier(self.THREADS, timeout=30)
+        status_codes = []
+
+        def borrow():
+            client = Client(raise_request_exception=False)
+            client.cookies = session_cookie
+            try:
+                barrier.wait()
+                status_codes.append(client.post(url, {'quantity': 1, 'reason': 'Stress'}).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=borrow) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.equipment.refresh_from_db()
+        requested = Requisition.objects.filter(equipment=self.equipment).count()
+        # With more borrowers than units, every unit is reserved exactly once;
+        # a run where the workers just fail (e.g. "database is locked") does not pass
+        self.assertEqual(len(status_codes), self.THREADS)
+        self.assertNotIn(500, status_codes)
+        self.assertEqual(requested, self.STOCK)
+        self.assertEqual(self.equipment.available_quantity, 0)
+
+
+class CartCheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='borrower', password='secret')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='AV')
+        self.kit = [
+            Equipment.objects.create(name=f'AV item {i}', category=category, total_quantity=2, available_quantity=2)
+            for i in range(10)
+        ]
+
+    def checkout(self, quantities, return_date='2030-01-31'):
+        session = self.client.session
+        session['cart'] = [equipment.pk for equipment in quantities]
+        session.save()
+        data = {f'quantity_{equipment.pk}': quantity for equipment, quantity in quantities.items()}
+        data['return_date'] = return_date
+        return self.client.post(reverse('checkout'), data)
+
+    def test_checkout_creates_all_requisitions(self):
+        response = self.checkout({equipment: 2 for equipment in self.kit})
+        self.assertRedirects(response, reverse('my_requests'), fetch_redirect_response=False)
+        self.assertEqual(Requisition.objects.filter(user=self.user, status='PENDING').count(), 10)
+        self.assertFalse(Equipment.objects.exclude(available_quantity=0).exists())
+        self.assertEqual(self.client.session['cart'], [])
+
+    def test_cart_changes_only_on_post(self):
+        add = reverse('add_to_cart', args=[self.kit[0].pk])
+        self.assertEqual(self.client.get(add).status_code, 405)
+        self.assertEqual(self.client.get(reverse('clear_cart')).status_code, 405)
+        self.assertEqual(self.client.session.get('cart', []), [])
+
+        response = self.client.post(add, HTTP_REFERER='http://testserver/search/?q=AV')
+        self.assertRedirects(response, 'http://testserver/search/?q=AV', fetch_redirect_response=False)
+        self.assertEqual(self.client.session['cart'], [self.kit[0].pk])
+        self.client.post(reverse('remove_from_cart', args=[self.kit[0].pk]))
+        self.assertEqual(self.client.session['cart'], [])
+
+    def test_add_to_cart_does_not_redirect_off_site(self):
+        response = self.client.post(reverse('add_to_cart', args=[self.kit[0].pk]), HTTP_REFERER='https://evil.example.com/')
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+    def test_one_short_item_fails_the_whole_cart(self):
+        quantities = {equipment: 1 for equipment in self.kit}
+        quantities[self.kit[-1]] = 3
+        response = self.checkout(quantities)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Only 2 items available.')
+        self.assertFalse(Requisition.objects.exists())
+        self.assertFalse(Equipment.objects.exclude(available_quantity=2).exists())
+
+    def test_invalid_return_date_changes_nothing(self):
+        response = self.checkout({self.kit[0]: 1}, return_date='')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Requisition.objects.exists())
+
+    def test_non_numeric_quantities_are_form_errors(self):
+        # '²' passes str.isdigit() but int() rejects it
+        for quantity in ('²', 'two', '0'):
+            response = self.checkout({self.kit[0]: quantity})
+            self.assertContains(response, 'Enter a quantity of at least 1.')
+        self.assertFalse(Requisition.objects.exists())
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        # The first checkout of the day also creates its rollup row
+        self.checkout({self.kit[0]: 1})
+        Requisition.objects.all().delete()
+        with CaptureQueriesContext(connection) as small:
+            self.checkout({self.kit[0]: 1})
+        Requisition.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            self.checkout({equipment: 1 for equipment in self.kit[1:]})
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Requisition.objects.count(), 9)
+
+
+class RequisitionQueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN on the requisition queries issued by the hot views, against
+    a seeded table large enough for the planner to prefer an index.
+    """
+    USERS = 20
+    PER_USER = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='approver', password='secret', is_staff=True)
+        users = [User.objects.create_user(username=f'user{i}') for i in range(cls.USERS)]
+        cls.user = users[0]
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(5)]
+        cls.category = categories[0]
+        equipment = Equipment.objects.bulk_create(
+            Equipment(name=f'Item {i}', category=categories[i % 5], total_quantity=5, available_quantity=5)
+            for i in range(100)
+        )
+        statuses = [status for status, _ in Requisition.STATUS_CHOICES]
+        Requisition.objects.bulk_create(
+            (
+                Requisition(user=user, equipment=equipment[i % 100], status=statuses[i % 4])
+                for user in users for i in range(cls.PER_USER)
+            ),
+            batch_size=1000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def table_scans(self, sql):
+        table = Requisition._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN ' + sql)
+                return [row[0] for row in cursor.fetchall() if f'Seq Scan on {table}' in row[0]]
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            # A bare "SCAN core_requisition" is a full table scan; index scans say "USING ... INDEX"
+            return [row[-1] for row in cursor.fetchall() if row[-1].split(' AS ')[0] == f'SCAN {table}']
+
+    def assertNoTableScan(self, url=None, run=None):
+        with CaptureQueriesContext(connection) as queries:
+            if url:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            else:
+                run()
+        sql = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and Requisition._meta.db_table in query['sql']
+        ]
+        self.assertTrue(sql)
+        for statement in sql:
+            self.assertEqual(self.table_scans(statement), [], statement)
+
+    def test_overdue_sweep(self):
+        self.assertNoTableScan(run=sweep_overdue)
+
+    def test_my_requests(self):
+        self.client.force_login(self.user)
+        self.assertNoTableScan(reverse('my_requests'))
+        self.assertNoTableScan(reverse('my_requests') + '?status=PENDING')
+
+    def test_manage_requests(self):
+        self.client.force_login(self.staff)
+        self.assertNoTableScan(reverse('manage_requests') + '?status=PENDING')
+        self.assertNoTableScan(reverse('manage_requests') + '?status=APPROVED')
+
+    def test_request_report(self):
+        self.client.force_login(self.staff)
+        today = timezone.localdate().isoformat()
+        self.assertNoTableScan(reverse('request_report') + f'?start_date={today}&end_date={today}')
+
+
+class RequisitionDailyStatTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='approver', password='secret', is_staff=True)
+        self.client.force_login(self.staff)
+        self.borrower = User.objects.create_user(username='borrower')
+        self.cameras = Category.objects.create(name='Camera')
+        self.tripods = Category.objects.create(name='Tripod')
+        self.camera = Equipment.objects.create(name='Camera', category=self.cameras, total_quantity=10, available_quantity=10)
+        self.tripod = Equipment.objects.create(name='Tripod', category=self.tripods, total_quantity=10, available_quantity=10)
+
+    def stats(self):
+        return {
+            (stat.day, stat.category_id, stat.status): (stat.requisition_count, stat.quantity)
+            for stat in RequisitionDailyStat.objects.all()
+            if stat.requisition_count or stat.quantity
+        }
+
+    def assertStatsMatchRebuild(self):
+        incremental = self.stats()
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        self.assertEqual(incremental, self.stats())
+
+    def test_signals_and_bulk_paths_match_rebuild(self):
+        first = Requisition.objects.create(user=self.borrower, equipment=self.camera, quantity=2)
+        second = Requisition.objects.create(user=self.borrower, equipment=self.tripod, quantity=3)
+        third = Requisition.objects.create(user=self.borrower, equipment=self.camera)
+        self.client.get(reverse('approve_request', args=[first.pk]))
+        self.client.post(reverse('bulk_update_requests'), {'action': 'reject', 'ids': [second.pk, third.pk]})
+        first.refresh_from_db()
+        first.quantity = 4
+        first.save()
+        third.delete()
+
+        self.tripod.category = self.cameras
+        self.tripod.save()
+
+        self.assertEqual(self.stats(), {
+            (timezone.localdate(), self.cameras.pk, 'APPROVED'): (1, 4),
+            (timezone.localdate(), self.cameras.pk, 'REJECTED'): (1, 3),
+        })
+        self.assertStatsMatchRebuild()
+
+    def test_deleting_equipment_or_users_fast_deletes_requisitions(self):
+        self.assertTrue(Collector(using='default').can_fast_delete(Requisition.objects.all()))
+
+        other = User.objects.create_user(username='other')
+        Requisition.objects.create(user=self.borrower, equipment=self.camera, quantity=2)
+        Requisition.objects.create(user=self.borrower, equipment=self.tripod, quantity=3, status='APPROVED')
+        Requisition.objects.create(user=other, equipment=self.tripod, quantity=1)
+        Requisition.objects.create(user=other, equipment=self.camera, quantity=4)
+
+        self.camera.delete()
+        self.assertEqual(self.stats(), {
+            (timezone.localdate(), self.tripods.pk, 'APPROVED'): (1, 3),
+            (timezone.localdate(), self.tripods.pk, 'PENDING'): (1, 1),
+        })
+        other.delete()
+        self.assertEqual(self.stats(), {(timezone.localdate(), self.tripods.pk, 'APPROVED'): (1, 3)})
+        self.assertStatsMatchRebuild()
+
+    def test_report_summary_comes_from_rollups(self):
+        Requisition.objects.create(user=self.borrower, equipment=self.camera, quantity=2)
+        Requisition.objects.create(user=self.borrower, equipment=self.camera, quantity=1, status='APPROVED')
+        today = timezone.localdate().isoformat()
+
+        response = self.client.get(reverse('request_report'), {'start_date': today, 'end_date': today})
+        summary = list(response.context['summary'])
+        self.assertEqual(len(summary), 1)
+        self.assertEqual(summary[0]['category_name'], 'Camera')
+        self.assertEqual((summary[0]['requisitions'], summary[0]['total_quantity']), (2, 3))
+        self.assertEqual((summary[0]['pending'], summary[0]['approved']), (1, 1))
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='approver', password='secret', is_staff=True)
+        self.client.force_login(self.staff)
+        self.borrower = User.objects.create_user(username='borrower')
+        self.cameras = Category.objects.create(name='Camera')
+        self.camera = Equipment.objects.create(name='Camera', category=self.cameras, total_quantity=10, available_quantity=10)
+        self.tripod = Equipment.objects.create(name='Tripod', category=self.cameras, total_quantity=10, available_quantity=10)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def loan(self, equipment, quantity=1, **dates):
+        requisition = Requisition.objects.create(user=self.borrower, equipment=equipment, quantity=quantity, status='RETURNED')
+        # date is auto_now_add, so backdated values are written afterwards
+        Requisition.objects.filter(pk=requisition.pk).update(**dates)
+        return requisition
+
+    def fetch(self, metric):
+        today = timezone.localdate()
+        response = self.client.get(reverse('analytics_data', args=[metric]), {
+            'start_date': (today - timedelta(days=30)).isoformat(),
+            'end_date': today.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_utilization_ranks_unit_hours(self):
+        start = self.now - timedelta(days=3)
+        self.loan(self.camera, 2, date=start, approve_date=start, actual_return_date=start + timedelta(hours=10))
+        self.loan(self.tripod, 1, date=start, approve_date=start, actual_return_date=start + timedelta(hours=5))
+
+        results = self.fetch('utilization')
+        self.assertEqual(
+            [(row['name'], row['rank'], row['unit_hours'], row['share']) for row in results],
+            [('Camera', 1, 20.0, 80.0), ('Tripod', 2, 5.0, 20.0)],
+        )
+
+    def test_turnaround_averages_per_category(self):
+        start = self.now - timedelta(days=3)
+        self.loan(self.camera, date=start, approve_date=start + timedelta(hours=2))
+        self.loan(self.camera, date=start, approve_date=start + timedelta(hours=4))
+        self.loan(self.camera, date=start, reject_date=start + timedelta(hours=1))
+
+        [row] = self.fetch('turnaround')
+        self.assertEqual(row['category_name'], 'Camera')
+        self.assertEqual((row['requests'], row['approved'], row['rejected']), (3, 2, 1))
+        self.assertEqual((row['approval_hours'], row['rejection_hours']), (3.0, 1.0))
+
+    def test_late_returns_per_day(self):
+        due = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=5), datetime.min.time()))
+        returned_at = due + timedelta(days=1, hours=6)
+        self.loan(self.camera, date=due, return_date=due, actual_return_date=returned_at)
+        self.loan(self.tripod, date=due, return_date=due + timedelta(days=1), actual_return_date=returned_at)
+
+        [row] = self.fetch('late-returns')
+        self.assertEqual(row['day'], timezone.localtime(returned_at).date().isoformat())
+        self.assertEqual((row['returned'], row['late'], row['hours_late'], row['late_rate']), (2, 1, 6.0, 50.0))
+
+    def test_charts_page_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('analytics_charts')).status_code, 200)
+        self.client.force_login(self.borrower)
+        self.assertRedirects(self.client.get(reverse('analytics_data', args=['utilization'])), reverse('dashboard'), fetch_redirect_response=False)
+
+
+class OverdueSweepTests(TestCase):
+    def setUp(self):
+        self.approver = User.objects.create_user(username='approver', email='approver@example.com', is_staff=True)
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com')
+        category = Category.objects.create(name='Projector')
+        self.projector = Equipment.objects.create(name='Projector', category=category, total_quantity=10, available_quantity=10)
+        self.past = timezone.now() - timedelta(days=3)
+
+    def loan(self, user, return_date, status='APPROVED'):
+        return Requisition.objects.create(
+            user=user, equipment=self.projector, status=status, return_date=return_date, approved_by=self.approver,
+        )
+
+    def sweep(self):
+        out = StringIO()
+        call_command('sweep_overdue', stdout=out)
+        return out.getvalue()
+
+    def test_loop_survives_database_errors(self):
+        command = 'core.management.commands.sweep_overdue'
+        # The second sleep stops the otherwise endless loop
+        with mock.patch(f'{command}.sweep_overdue', side_effect=[OperationalError('server closed the connection'), SweepResult()]), \
+                mock.patch(f'{command}.close_old_connections') as close_old_connections, \
+                mock.patch(f'{command}.time.sleep', side_effect=[None, KeyboardInterrupt]) as sleep, \
+                self.assertLogs(command, 'ERROR'):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('sweep_overdue', every=60, stdout=StringIO())
+        self.assertEqual(close_old_connections.call_count, 2)
+        sleep.assert_called_with(60)
+
+    def test_one_digest_per_borrower_and_approver(self):
+        overdue = [self.loan(self.alice, self.past), self.loan(self.alice, self.past), self.loan(self.bob, self.past)]
+        self.loan(self.alice, timezone.now() + timedelta(days=3))
+        self.loan(self.bob, self.past, status='RETURNED')
+
+        self.assertIn('Flagged 3 overdue requisitions, sent 3 digests', self.sweep())
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, ['alice@example.com', 'approver@example.com', 'bob@example.com'])
+        approver_digest = next(message for message in mail.outbox if message.to == ['approver@example.com'])
+        self.assertEqual(approver_digest.subject, '3 overdue items')
+        self.assertEqual(
+            set(Requisition.objects.filter(overdue_notified_at__isnull=False).values_list('pk', flat=True)),
+            {requisition.pk for requisition in overdue},
+        )
+
+    def test_repeated_sweeps_do_not_resend(self):
+        self.loan(self.alice, self.past)
+        self.sweep()
+        mail.outbox.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIn('Flagged 0 overdue requisitions', self.sweep())
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(len([query for query in queries if 'core_requisition' in query['sql']]), 1)
+
+
+class SessionRefreshTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='borrower'))
+        self.session_key = self.client.cookies['sessionid'].value
+
+    def session_writes(self, requests=20):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests):
+                self.assertEqual(self.client.get(reverse('search_equipment')).status_code, 200)
+        return [
+            query for query in queries
+            if 'django_session' in query['sql'] and query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+
+    def test_fresh_session_is_not_rewritten(self):
+        self.assertEqual(self.session_writes(), [])
+
+    def test_expiry_is_refreshed_once_due(self):
+        session = Session.objects.get(session_key=self.session_key)
+        session.expire_date -= timedelta(minutes=6)
+        session.save()
+
+        self.assertEqual(len(self.session_writes()), 1)
+        expire_date = Session.objects.get(session_key=self.session_key).expire_date
+        self.assertAlmostEqual(expire_date, timezone.now() + timedelta(hours=1), delta=timedelta(minutes=1))
+
+
+class DashboardCountsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='borrower', password='secret')
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name='Speaker')
+        self.equipment = Equipment.objects.create(name='Speaker', category=self.category)
+
+    def counts(self):
+        response = self.client.get(reverse('dashboard'))
+        return {key: response.context[key] for key in ('equipment_count', 'requisition_count', 'pending_count', 'my_pending_count')}
+
+    def test_counts_come_from_one_aggregate_then_cache(self):
+        other = User.objects.create_user(username='other')
+        Requisition.objects.create(user=self.user, equipment=self.equipment)
+        Requisition.objects.create(user=other, equipment=self.equipment, status='APPROVED')
+
+        with CaptureQueriesContext(connection) as cold:
+            counts = self.counts()
+        self.assertEqual(counts, {'equipment_count': 1, 'requisition_count': 2, 'pending_count': 1, 'my_pending_count': 1})
+        self.assertEqual(sum('core_requisition' in q['sql'] for q in cold.captured_queries), 1)
+
+        with CaptureQueriesContext(connection) as warm:
+            self.assertEqual(self.counts(), counts)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in warm.captured_queries))
+
+    def test_signals_invalidate_counts(self):
+        self.counts()
+        requisition = Requisition.objects.create(user=self.user, equipment=self.equipment)
+        self.assertEqual(self.counts()['my_pending_count'], 1)
+
+        requisition.status = 'APPROVED'
+        requisition.save()
+        self.assertEqual(self.counts()['my_pending_count'], 0)
+
+        Equipment.objects.create(name='Speaker 2', category=self.category)
+        self.assertEqual(self.counts()['equipment_count'], 2)
+
+        self.equipment.delete()
+        self.assertEqual(self.counts(), {'equipment_count': 1, 'requisition_count': 0, 'pending_count': 0, 'my_pending_count': 0})
+
+    def test_counts_cached_before_commit_are_dropped_on_commit(self):
+        keys = [DASHBOARD_COUNTS_KEY, dashboard_user_counts_key(self.user.pk)]
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Requisition.objects.create(user=self.user, equipment=self.equipment)
+                # A concurrent dashboard request re-reads the committed (old) counts
+                cache.set_many({key: {'stale': True} for key in keys})
+        self.assertEqual(cache.get_many(keys), {})
+
+
+class SearchEquipmentTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='borrower'))
+        audio = Category.objects.create(name='Audio')
+        video = Category.objects.create(name='Video')
+        Equipment.objects.create(name='Wireless Mic', category=audio, serial_number='MIC-001')
+        Equipment.objects.create(name='Projector', category=video, serial_number='PJ-778')
+        Equipment.objects.create(name='Webcam', category=video, serial_number='CAM-42')
+
+    def names(self, query):
+        response = self.client.get(reverse('search_equipment'), {'q': query})
+        return sorted(item['name'] for item in response.json()['results'])
+
+    def test_matches_name_serial_and_category(self):
+        self.assertEqual(self.names('wireless'), ['Wireless Mic'])
+        self.assertEqual(self.names('pj-7'), ['Projector'])
+        self.assertEqual(self.names('video'), ['Projector', 'Webcam'])
+        self.assertEqual(self.names(''), ['Projector', 'Webcam', 'Wireless Mic'])
+        self.assertEqual(self.names('nothing'), [])
+
+    def test_cursor_mode_walks_all_results_without_count(self):
+        seen = []
+        params = {'mode': 'cursor', 'limit': 2}
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(reverse('search_equipment'), params).json()
+            self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+            self.assertNotIn('num_pages', data)
+            seen.extend(item['name'] for item in data['results'])
+            if not data['has_next']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(seen, ['Webcam', 'Projector', 'Wireless Mic'])
+
+    def test_page_mode_keeps_legacy_shape(self):
+        data = self.client.get(reverse('search_equipment'), {'page': 1}).json()
+        self.assertEqual(data['num_pages'], 1)
+        self.assertEqual(data['current_page'], 1)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='borrower')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Audio')
+        self.mic = Equipment.objects.create(name='Wireless Mic', category=category, total_quantity=5, available_quantity=5)
+        self.requisition = Requisition.objects.create(user=self.user, equipment=self.mic)
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response.status_code, [query['sql'] for query in queries if 'core_' in query['sql']]
+
+    def test_unchanged_lists_answer_304_from_one_aggregate(self):
+        for url in (reverse('search_equipment'), reverse('equipment_data'), reverse('my_requests')):
+            status, queries = self.revalidate(url)
+            self.assertEqual(status, 304)
+            self.assertEqual(len(queries), 1)
+            self.assertIn('MAX(', queries[0])
+
+    def test_changes_invalidate_etag(self):
+        search, requests = reverse('search_equipment'), reverse('my_requests')
+        etag = self.client.get(search)['ETag']
+        self.client.post(reverse('equipment_request', args=[self.mic.pk]), {'quantity': 1, 'reason': 'Meeting'})
+        self.assertEqual(self.client.get(search, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(requests)['ETag']
+        self.requisition.status = 'APPROVED'
+        self.requisition.save()
+        self.assertEqual(self.client.get(requests, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(requests)['ETag']
+        self.mic.delete()
+        self.assertEqual(self.client.get(requests, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_stock_updates_touch_updated_at(self):
+        before = self.mic.updated_at
+        self.client.post(reverse('equipment_request', args=[self.mic.pk]), {'quantity': 1, 'reason': 'Meeting'})
+        self.mic.refresh_from_db()
+        self.assertGreater(self.mic.updated_at, before)
+
+    def test_my_requests_etag_covers_page_chrome(self):
+        url = reverse('my_requests')
+        response = self.client.get(url)
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'private', 'no-cache'})
+        etag = response['ETag']
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('private', not_modified['Cache-Control'])
+
+        # A new CSRF secret (e.g. after logging in again) renders a new logout form
+        self.client.cookies.pop('csrftoken')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)['ETag']
+        self.user.first_name = 'Somchai'
+        self.user.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)['ETag']
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get(reverse('my_requests'))['ETag']
+        self.client.force_login(User.objects.create_user(username='other'))
+        self.assertEqual(self.client.get(reverse('my_requests'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_catalog_stats()
+        self.client.force_login(User.objects.create_user(username='borrower'))
+        self.category = Category.objects.create(name='Audio')
+        self.mic = Equipment.objects.create(name='Wireless Mic', category=self.category, total_quantity=5, available_quantity=5)
+
+    def search(self):
+        return self.client.get(reverse('search_equipment'), {'q': 'mic'}).json()['results']
+
+    def equipment_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        # Leaves out the MAX(updated_at) freshness check behind the ETag
+        return [
+            query for query in queries
+            if ('core_equipment' in query['sql'] or 'core_category' in query['sql']) and 'MAX(' not in query['sql']
+        ]
+
+    def test_repeated_reads_are_served_from_cache(self):
+        for url, params in (
+            (reverse('search_equipment'), {'q': 'mic'}),
+            (reverse('search_equipment'), {'q': 'mic', 'mode': 'cursor'}),
+            (reverse('equipment_data'), {'draw': 1, 'search[value]': 'audio'}),
+            (reverse('equipment_request', args=[self.mic.pk]), None),
+        ):
+            self.assertTrue(self.equipment_queries(url, params))
+            self.assertEqual(self.equipment_queries(url, params), [])
+
+        stats = catalog_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (5, 5))
+
+    def test_counters_are_written_to_the_cache_periodically(self):
+        self.search()
+        self.search()
+        self.assertIsNone(cache.get(CATALOG_HITS_KEY))
+
+        with mock.patch('core.catalog.CATALOG_STATS_FLUSH_INTERVAL', 0):
+            self.search()
+        self.assertEqual(cache.get(CATALOG_HITS_KEY), 2)
+        self.assertEqual(cache.get(CATALOG_MISSES_KEY), 1)
+
+    def test_mutations_are_visible_immediately(self):
+        self.assertEqual(self.search()[0]['name'], 'Wireless Mic')
+
+        self.mic.name = 'Wireless Mic Pro'
+        self.mic.save()
+        self.assertEqual(self.search()[0]['name'], 'Wireless Mic Pro')
+
+        self.client.post(reverse('equipment_request', args=[self.mic.pk]), {'quantity': 2, 'reason': 'Meeting'})
+        self.assertEqual(self.search()[0]['available_quantity'], 3)
+
+        self.category.name = 'Sound'
+        self.category.save()
+        data = self.client.get(reverse('equipment_data'), {'draw': 2}).json()
+        self.assertEqual(data['draw'], 2)
+        self.assertEqual(data['data'][0]['category'], 'Sound')
+
+        url = reverse('equipment_request', args=[self.mic.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.mic.delete()
+        self.assertEqual(self.search(), [])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='borrower')
+        category = Category.objects.create(name='Audio')
+        self.mic = Equipment.objects.create(name='Wireless Mic', category=category, total_quantity=5, available_quantity=5)
+        Requisition.objects.create(user=self.user, equipment=self.mic)
+
+    async def test_read_views_run_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('search_equipment'), {'q': 'mic'})
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Wireless Mic'])
+        response = await self.async_client.get(reverse('search_equipment'), {'q': 'mic', 'mode': 'cursor'})
+        self.assertFalse(response.json()['has_next'])
+
+        response = await self.async_client.get(reverse('dashboard'))
+        self.assertEqual(response.context['my_pending_count'], 1)
+
+        response = await self.async_client.get(reverse('my_requests'))
+        self.assertEqual(len(response.context['requisitions']), 1)
+        response = await self.async_client.get(reverse('my_requests'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_middleware_stays_async_under_asgi(self):
+        from django.conf import settings
+        from django.utils.module_loading import import_string
+
+        # A sync-only middleware makes Django hop threads around the async views
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), 'async_capable', False), path)
+
+    async def test_report_csv_streams_under_asgi(self):
+        staff = await User.objects.acreate(username='approver', is_staff=True)
+        await self.async_client.aforce_login(staff)
+        response = await self.async_client.get(reverse('request_report'), {'export': 'csv'})
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Wireless Mic', lines[1])
+
+
+class DbPoolStatsTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='pw', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_production_settings_pool_connections(self):
+        from config import settings as project_settings
+
+        if not project_settings.DB_POOL_MAX_SIZE:
+            self.skipTest('pooling disabled through DB_POOL_MAX_SIZE=0')
+        database = project_settings.DATABASES['default']
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], project_settings.DB_POOL_MAX_SIZE)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        # Django refuses to combine a pool with persistent connections
+        self.assertEqual(database.get('CONN_MAX_AGE', 0), 0)
+
+    def test_reports_connection_reuse_for_this_worker(self):
+        # Whatever DATABASES the suite runs with: pooled with the project settings
+        database = connection.settings_dict
+        if database['OPTIONS'].get('pool'):
+            expected = 'pool'
+        elif database['CONN_MAX_AGE']:
+            expected = 'persistent'
+        else:
+            expected = 'per-request'
+        response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['mode'], expected)
+        self.assertEqual(response.json()['pid'], os.getpid())
+        if expected == 'pool':
+            self.assertIn('pool_max', response.json()['pool'])
+
+    def test_reports_persistent_connections(self):
+        if connection.settings_dict['OPTIONS'].get('pool'):
+            self.skipTest('a pool takes precedence over CONN_MAX_AGE')
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=60):
+            self.assertEqual(self.client.get(reverse('db_pool_stats')).json()['mode'], 'persistent')
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user(username='member', password='pw'))
+        self.assertRedirects(self.client.get(reverse('db_pool_stats')), reverse('dashboard'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_LAG=10)
+class ReplicaRouterTests(TestCase):
+    """
+    Runs against two local database connections: 'replica' is a mirror of
+    the test database, so every query shows which alias served it. The
+    alias is only added for this class, after the test runner has set up
+    the databases.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings['replica'] = {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}}
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='staff', password='pw', is_staff=True)
+        self.client.force_login(self.staff)
+        category = Category.objects.create(name='Audio')
+        self.mic = Equipment.objects.create(name='Microphone', category=category, total_quantity=5, available_quantity=5)
+        self.requisition = Requisition.objects.create(
+            user=self.staff, equipment=self.mic, quantity=1, status='PENDING', return_date=timezone.now() + timedelta(days=1),
+        )
+
+    def queries_by_alias(self, method, *args, **kwargs):
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            response = method(*args, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, [q['sql'] for q in primary], [q['sql'] for q in replica]
+
+    def test_reports_and_listings_read_from_replica(self):
+        for url, params in [
+            (reverse('request_report'), {'start_date': '', 'end_date': ''}),
+            (reverse('request_report'), {'start_date': '', 'end_date': '', 'export': 'csv'}),
+            (reverse('manage_requests'), {}),
+            (reverse('my_requests'), {}),
+        ]:
+            response, primary, replica = self.queries_by_alias(self.client.get, url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(any('core_requisition' in sql for sql in replica), url)
+            self.assertFalse(any('core_requisition' in sql for sql in primary), url)
+
+    def test_other_views_and_sessions_stay_on_primary(self):
+        response, primary, replica = self.queries_by_alias(self.client.get, reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, [])
+
+        _, primary, replica = self.queries_by_alias(self.client.get, reverse('manage_requests'))
+        self.assertTrue(any('django_session' in sql for sql in primary))
+        self.assertFalse(any('django_session' in sql for sql in replica))
+
+    def test_browser_that_wrote_reads_from_primary(self):
+        response = self.client.get(reverse('approve_request', args=[self.requisition.pk]))
+        self.assertEqual(response.cookies['db_primary']['max-age'], 10)
+
+        response, primary, replica = self.queries_by_alias(self.client.get, reverse('manage_requests'))
+        self.assertContains(response, 'Microphone')
+        self.assertEqual(replica, [])
+        self.assertTrue(any('core_requisition' in sql for sql in primary))
+
+        self.client.cookies.pop('db_primary')
+        _, _, replica = self.queries_by_alias(self.client.get, reverse('manage_requests'))
+        self.assertTrue(any('core_requisition' in sql for sql in replica))
+
+    def test_fresh_catalog_is_cached_from_primary(self):
+        def page_queries(queries):
+            # The ETag's MAX(updated_at) freshness check is not cached
+            return [sql for sql in queries if 'core_equipment' in sql and 'MAX(' not in sql]
+
+        bump_catalog_version()
+        _, primary, replica = self.queries_by_alias(self.client.get, reverse('equipment_data'))
+        self.assertTrue(page_queries(primary))
+        self.assertFalse(page_queries(replica))
+
+        with override_settings(DATABASE_REPLICA_LAG=0):
+            bump_catalog_version()
+            _, primary, replica = self.queries_by_alias(self.client.get, reverse('equipment_data'))
+        self.assertFalse(page_queries(primary))
+        self.assertTrue(page_queries(replica))
+
+    def test_nothing_is_routed_outside_requests(self):
+        self.assertEqual(Equipment.objects.all().db, 'default')
+
+
+class SeedDataTests(TestCase):
+    def seed(self, seed=7):
+        out = StringIO()
+        call_command(
+            'seed_data', '--requisitions', '400', '--users', '20', '--staff', '3', '--equipment', '30',
+            '--categories', '4', '--seed', str(seed), '--until', '2026-06-30', '--chunk-size', '150', stdout=out,
+        )
+        return out.getvalue()
+
+    def test_seeds_every_model_and_reports_rate(self):
+        output = self.seed()
+        self.assertIn('rows/s', output)
+        self.assertEqual(User.objects.filter(username__startswith='seed7-').count(), 23)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='seed7-').count(), 23)
+        self.assertEqual(Equipment.objects.count(), 30)
+        self.assertEqual(Requisition.objects.count(), 400)
+        self.assertEqual(set(Requisition.objects.values_list('status', flat=True)), {'PENDING', 'APPROVED', 'REJECTED', 'RETURNED'})
+        # Dates are the generated ones, not the time of the insert
+        until = datetime(2026, 7, 1, tzinfo=timezone.get_current_timezone())
+        self.assertLess(Requisition.objects.order_by('-date').first().date, until)
+        self.assertLess(Equipment.objects.order_by('-updated_at').first().updated_at, until)
+        # ... without touching the model fields that other saves rely on
+        self.assertTrue(Equipment._meta.get_field('updated_at').auto_now)
+        self.assertFalse(Requisition.objects.filter(status='RETURNED', actual_return_date__isnull=True).exists())
+        self.assertFalse(Equipment.objects.filter(available_quantity__gt=models.F('total_quantity')).exists())
+        # Bulk writes skip the signals, so the rollups are rebuilt
+        self.assertEqual(sum(RequisitionDailyStat.objects.values_list('requisition_count', flat=True)), 400)
+
+    def test_same_seed_same_rows(self):
+        self.seed()
+        first = list(Requisition.objects.order_by('pk').values_list('date', 'status', 'quantity', 'user__username', 'equipment__serial_number'))
+        Requisition.objects.all().delete()
+        Equipment.objects.all().delete()
+        User.objects.filter(username__startswith='seed7-').delete()
+        self.seed()
+        second = list(Requisition.objects.order_by('pk').values_list('date', 'status', 'quantity', 'user__username', 'equipment__serial_number'))
+        self.assertEqual(first, second)
+
+    def test_seeding_twice_fails_cleanly(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed(seed=8)
+        self.assertEqual(Requisition.objects.count(), 800)
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        source, self.static_root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.static_root)
+        os.makedirs(os.path.join(source, 'css'))
+        os.makedirs(os.path.join(source, 'img'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as f:
+            f.write('.logo { background: url("../img/logo.svg"); }\n' * 50)
+        with open(os.path.join(source, 'img', 'logo.svg'), 'w') as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg"></svg>')
+
+        settings_override = override_settings(STATICFILES_DIRS=[source], STATIC_ROOT=self.static_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_hashed_files_are_precompressed_and_cached_forever(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        url = staticfiles_storage.url('css/site.css')
+        self.assertRegex(url, r'/static/css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.isfile(os.path.join(self.static_root, url[len('/static/'):] + '.gz')))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(b'logo.', gzip.decompress(b''.join(response.streaming_content)))
+
+        response = self.client.get(url)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_unhashed_names_are_revalidated(self):
+        response = self.client.get('/static/img/logo.svg')
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.client.get('/static/img/logo.svg', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+
+class EquipmentRenditionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(name='Camera')
+
+    def upload(self, name='photo.png', size=(2400, 1600)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_creates_renditions(self):
+        equipment = Equipment.objects.create(name='DSLR', category=self.category, image=self.upload())
+        for name in rendition_names(equipment.image.name):
+            self.assertTrue(default_storage.exists(name), name)
+        with default_storage.open(rendition_names(equipment.image.name)[0]) as thumb:
+            image = Image.open(thumb)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (300, 200))
+        self.assertTrue(equipment.renditions['thumb_webp'].endswith('.thumb.webp'))
+
+    def test_replacing_and_deleting_image_cleans_up_renditions(self):
+        equipment = Equipment.objects.create(name='DSLR', category=self.category, image=self.upload())
+        old_renditions = rendition_names(equipment.image.name)
+        equipment.image = self.upload('second.png')
+        equipment.save()
+        self.assertFalse(any(default_storage.exists(name) for name in old_renditions))
+
+        new_renditions = rendition_names(equipment.image.name)
+        equipment.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in new_renditions))
+
+    def test_same_stem_with_different_extensions_keeps_separate_renditions(self):
+        self.assertNotEqual(
+            set(rendition_names('equipment_images/drill.jpg')), set(rendition_names('equipment_images/drill.png'))
+        )
+        self.assertIn('equipment_images/drill.jpg.thumb.webp', rendition_names('equipment_images/drill.jpg'))
+
+    def test_oversized_image_is_saved_without_renditions(self):
+        with mock.patch('PIL.Image.MAX_IMAGE_PIXELS', 1000), self.assertLogs('core.models', 'ERROR'):
+            equipment = Equipment.objects.create(name='DSLR', category=self.category, image=self.upload())
+        self.assertTrue(default_storage.exists(equipment.image.name))
+        self.assertFalse(any(default_storage.exists(name) for name in rendition_names(equipment.image.name)))
+
+    def test_search_payload_exposes_renditions(self):
+        Equipment.objects.create(name='DSLR', category=self.category, image=self.upload())
+        self.client.force_login(User.objects.create_user(username='borrower'))
+        item = self.client.get(reverse('search_equipment')).json()['results'][0]
+        self.assertTrue(item['renditions']['thumb_webp'].endswith('.thumb.webp'))
+        self.assertTrue(item['renditions']['thumb_jpg'].endswith('.thumb.jpg'))
+
+    def test_missing_renditions_fall_back_to_the_original(self):
+        with mock.patch('PIL.Image.MAX_IMAGE_PIXELS', 1000), self.assertLogs('core.models', 'ERROR'):
+            equipment = Equipment.objects.create(name='DSLR', category=self.category, image=self.upload())
+        self.assertEqual(equipment.renditions, {})
+        self.client.force_login(User.objects.create_user(username='borrower'))
+        item = self.client.get(reverse('search_equipment')).json()['results'][0]
+        self.assertEqual(item['renditions'], {})
+        self.assertEqual(item['image_url'], equipment.image.url)
+        response = self.client.get(reverse('equipment_request', args=[equipment.pk]))
+        self.assertContains(response, f'<img src="{equipment.image.url}"')
+        self.assertNotContains(response, 'image/webp')
+
+    def test_backfill_command(self):
+        equipment = Equipment.objects.create(name='DSLR', category=self.category, image=self.upload())
+        for name in rendition_names(equipment.image.name):
+            default_storage.delete(name)
+        out = StringIO()
+        call_command('build_renditions', stdout=out)
+        self.assertIn('built for 1 images', out.getvalue())
+        self.assertTrue(all(default_storage.exists(name) for name in rendition_names(equipment.image.name)))
+
+
+class EquipmentQrTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['qrcodes'].clear()
+        self.staff = User.objects.create_user(username='approver', is_staff=True)
+        self.client.force_login(self.staff)
+        audio = Category.objects.create(name='Audio')
+        video = Category.objects.create(name='Video')
+        self.mic = Equipment.objects.create(name='Mic', category=audio, serial_number='MIC-1')
+        self.projector = Equipment.objects.create(name='Projector', category=video, serial_number='PJ-1')
+
+    def test_png_and_svg_with_http_caching(self):
+        response = self.client.get(reverse('equipment_qr', args=[self.mic.pk, 'png']))
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertIn('max-age=86400', response['Cache-Control'])
+
+        revalidated = self.client.get(
+            reverse('equipment_qr', args=[self.mic.pk, 'png']),
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+        svg = self.client.get(reverse('equipment_qr', args=[self.mic.pk, 'svg']))
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', svg.content)
+
+    def test_scanner_works_offline(self):
+        response = self.client.get(reverse('scan_qr'))
+        self.assertContains(response, 'js/scan-qr.js')
+        self.assertContains(response, 'id="manual-entry"')
+        self.assertNotContains(response, 'unpkg.com')
+
+    def test_unknown_equipment_or_format(self):
+        self.assertEqual(self.client.get(reverse('equipment_qr', args=[999, 'png'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('equipment_qr', args=[self.mic.pk, 'gif'])).status_code, 404)
+
+    def test_label_sheet_is_paginated(self):
+        with mock.patch('core.views.LABEL_SHEET_SIZE', 1):
+            first = self.client.get(reverse('equipment_labels'))
+            second = self.client.get(reverse('equipment_labels'), {'page': 2})
+        self.assertContains(first, '<svg', count=1)
+        self.assertContains(first, 'sheet 1 of 2')
+        self.assertContains(first, 'page=2')
+        self.assertContains(first, 'render_labels')
+        self.assertContains(second, '<svg', count=1)
+        self.assertNotContains(second, 'Next sheet')
+
+    def test_qr_codes_use_their_own_cache(self):
+        self.client.get(reverse('equipment_qr', args=[self.mic.pk, 'png']))
+        data = equipment_request_url('http://testserver/', self.mic.pk)
+        self.assertIsNone(cache.get(qr_cache_key(data, 'png')))
+        self.assertIsNotNone(caches['qrcodes'].get(qr_cache_key(data, 'png')))
+
+    def test_label_sheet_filters_by_category(self):
+        response = self.client.get(reverse('equipment_labels'), {'category': 'Video'})
+        self.assertContains(response, 'Projector')
+        self.assertNotContains(response, 'MIC-1')
+        self.assertContains(response, '<svg', count=1)
+        # Not a category id, so looked up (and not found) by name
+        response = self.client.get(reverse('equipment_labels'), {'category': '²'})
+        self.assertNotContains(response, '<svg')
+
+    def test_render_labels_command(self):
+        output = os.path.join(tempfile.mkdtemp(), 'labels.html')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        out = StringIO()
+        call_command('render_labels', '--base-url', 'https://assets.example.com', '--output', output, stdout=out)
+        self.assertIn('Wrote 2 labels', out.getvalue())
+        with open(output, encoding='utf-8') as sheet:
+            self.assertEqual(sheet.read().count('<svg'), 2)
+
+
+class BulkRequestActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='approver', is_staff=True)
+        self.client.force_login(self.staff)
+        category = Category.objects.create(name='Laptop')
+        self.laptop = Equipment.objects.create(name='Laptop', category=category, total_quantity=10, available_quantity=4)
+        self.mouse = Equipment.objects.create(name='Mouse', category=category, total_quantity=10, available_quantity=7)
+        self.borrower = User.objects.create_user(username='borrower')
+
+    def requisitions(self, equipment, count, status='PENDING', quantity=1):
+        return [
+            Requisition.objects.create(user=self.borrower, equipment=equipment, quantity=quantity, status=status).pk
+            for _ in range(count)
+        ]
+
+    def bulk(self, action, ids, **extra):
+        return self.client.post(reverse('bulk_update_requests'), {'action': action, 'ids': ids, **extra})
+
+    def test_bulk_approve_in_bounded_queries(self):
+        # The first approval of the day also creates its rollup row
+        self.bulk('approve', self.requisitions(self.laptop, 1))
+        ids = self.requisitions(self.laptop, 3)
+        with CaptureQueriesContext(connection) as few:
+            self.bulk('approve', ids)
+        ids = self.requisitions(self.laptop, 30)
+        with self.assertNumQueries(len(few)):
+            self.bulk('approve', ids)
+        self.assertEqual(Requisition.objects.filter(status='APPROVED', approved_by=self.staff).count(), 34)
+
+    def test_bulk_reject_restores_stock_per_equipment(self):
+        ids = self.requisitions(self.laptop, 2, quantity=2) + self.requisitions(self.mouse, 3)
+        self.bulk('reject', ids, reject_reason='Budget')
+        self.laptop.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.laptop.available_quantity, 8)
+        self.assertEqual(self.mouse.available_quantity, 10)
+        self.assertEqual(set(Requisition.objects.values_list('reject_reason', flat=True)), {'Budget'})
+
+    def test_bulk_receive_skips_requisitions_in_other_states(self):
+        approved = self.requisitions(self.laptop, 2, status='APPROVED')
+        pending = self.requisitions(self.laptop, 1)
+        self.bulk('receive', approved + pending)
+        self.bulk('receive', approved)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.available_quantity, 6)
+        self.assertEqual(Requisition.objects.get(pk=pending[0]).status, 'PENDING')
+
+    def test_bulk_actions_refresh_dashboard_counts(self):
+        ids = self.requisitions(self.laptop, 2)
+        self.assertEqual(self.client.get(reverse('dashboard')).context['pending_count'], 2)
+        self.bulk('approve', ids)
+        self.assertEqual(self.client.get(reverse('dashboard')).context['pending_count'], 0)
+
+    def test_bulk_action_on_every_request_matching_the_filter(self):
+        self.requisitions(self.mouse, 55)
+        returned = self.requisitions(self.laptop, 2, status='RETURNED')
+        response = self.client.get(reverse('manage_requests'), {'status': 'PENDING'})
+        self.assertTrue(response.context['has_more_pages'])
+        self.assertContains(response, 'id="selectMatchingLink"')
+        # The filter is honoured: nothing returned can be approved
+        self.client.post(reverse('bulk_update_requests'), {'action': 'approve', 'scope': 'filter', 'status': 'RETURNED'})
+        self.assertFalse(Requisition.objects.filter(status='APPROVED').exists())
+        # Every pending request is approved, not only the first page
+        self.client.post(reverse('bulk_update_requests'), {'action': 'approve', 'scope': 'filter', 'status': 'PENDING'})
+        self.assertEqual(Requisition.objects.filter(status='APPROVED').count(), 55)
+        self.assertEqual(Requisition.objects.filter(pk__in=returned, status='RETURNED').count(), 2)
+
+    def test_bulk_ignores_ids_that_are_not_integers(self):
+        ids = self.requisitions(self.laptop, 2)
+        response = self.bulk('approve', ids + ['²', 'x'])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Requisition.objects.filter(status='APPROVED').count(), 2)
+
+    def test_requires_staff_and_post(self):
+        ids = self.requisitions(self.laptop, 1)
+        self.assertEqual(self.client.get(reverse('bulk_update_requests')).status_code, 405)
+        self.client.force_login(self.borrower)
+        self.bulk('approve', ids)
+        self.assertEqual(Requisition.objects.get().status, 'PENDING')
+
+
+class EquipmentImportTests(TestCase):
+    CSV = (
+        'name,category,total_quantity,available_quantity,serial_number,status\n'
+        'Laptop A,Laptop,5,5,LAP-1,AVAILABLE\n'
+        'Laptop B,Laptop,2,3,LAP-2,AVAILABLE\n'
+        'Camera,Camera,1,1,CAM-1,BROKEN\n'
+        'Laptop C,Laptop,1,1,LAP-1,\n'
+        'Tripod,Camera,1,1,EXIST-1,\n'
+        ',Camera,1,1,,\n'
+        'Cable,Accessory,10,10,,\n'
+    )
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='approver', is_staff=True)
+        self.client.force_login(self.staff)
+        self.camera = Category.objects.create(name='Camera')
+        Equipment.objects.create(name='Old tripod', category=self.camera, serial_number='EXIST-1')
+
+    def upload(self, content, name='equipment.csv'):
+        return self.client.post(reverse('import_equipment'), {'file': SimpleUploadedFile(name, content)})
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        response = self.upload(self.CSV.encode())
+        result = response.context['result']
+        self.assertEqual(result.rows, 7)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([row for row, _ in result.errors], [3, 4, 5, 6, 7])
+        self.assertIn('Available quantity cannot be greater', dict(result.errors)[3])
+        self.assertIn('already exists', dict(result.errors)[6])
+
+        self.assertEqual(Equipment.objects.get(serial_number='LAP-1').name, 'Laptop A')
+        cable = Equipment.objects.get(name='Cable')
+        self.assertIsNone(cable.serial_number)
+        self.assertEqual(cable.status, 'AVAILABLE')
+        # Existing categories are reused, new ones created once
+        self.assertEqual(Category.objects.filter(name='Camera').count(), 1)
+        self.assertEqual(sorted(Category.objects.values_list('name', flat=True)), ['Accessory', 'Camera', 'Laptop'])
+
+    def test_import_form_leaves_only_serial_numbers_to_the_importer(self):
+        data = {
+            'name': 'Tripod', 'category': self.camera.pk, 'category_name': 'Camera', 'total_quantity': 1,
+            'available_quantity': 1, 'serial_number': 'EXIST-1', 'status': 'AVAILABLE',
+        }
+        self.assertTrue(EquipmentImportForm(data).is_valid())
+        self.assertIn('serial_number', EquipmentForm(data).errors)
+
+    def test_xlsx_upload(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Name', 'Category', 'Total_Quantity', 'Available_Quantity', 'Serial_Number'])
+        sheet.append(['Projector', 'Video', 3, 2, 'PJ-9'])
+        buffer = BytesIO()
+        workbook.save(buffer)
+
+        result = self.upload(buffer.getvalue(), 'equipment.xlsx').context['result']
+        self.assertEqual((result.created, result.errors), (1, []))
+        self.assertEqual(Equipment.objects.get(serial_number='PJ-9').available_quantity, 2)
+
+    def test_queries_do_not_grow_per_row(self):
+        def csv_rows(start, count):
+            lines = ['name,category,total_quantity,available_quantity,serial_number']
+            lines += [f'Item {i},Bulk,1,1,BULK-{i}' for i in range(start, start + count)]
+            return '\n'.join(lines).encode()
+
+        with CaptureQueriesContext(connection) as few:
+            self.upload(csv_rows(0, 10))
+        with CaptureQueriesContext(connection) as many:
+            self.upload(csv_rows(10, 500))
+        # Only bulk_create batching (SQLite's parameter limit) adds statements
+        self.assertLess(len(many), len(few) + 10)
+        self.assertEqual(Equipment.objects.filter(category__name='Bulk').count(), 510)
+
+    def test_management_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'equipment.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(self.CSV)
+        out, err = StringIO(), StringIO()
+        call_command('import_equipment', path, stdout=out, stderr=err)
+        self.assertIn('Imported 2 of 7 rows (5 skipped)', out.getvalue())
+        self.assertIn('row 4: status', err.getvalue())
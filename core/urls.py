@@ -4,15 +4,19 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('equipment/', views.equipment_list, name='equipment_list'),
+    path('equipment/data/', views.equipment_data, name='equipment_data'),
+    path('equipment/labels/', views.equipment_labels, name='equipment_labels'),
+    path('equipment/<int:equipment_id>/qr.<str:fmt>', views.equipment_qr, name='equipment_qr'),
     path('equipment/add/', views.add_equipment, name='add_equipment'),
+    path('equipment/import/', views.import_equipment, name='import_equipment'),
     path('equipment/edit/<int:equipment_id>/', views.edit_equipment, name='edit_equipment'),
     path('equipment/delete/<int:equipment_id>/', views.delete_equipment, name='delete_equipment'),
     path('search-equipment/', views.search_equipment, name='search_equipment'),
-    # path('add-to-cart/<int:equipment_id>/', views.add_to_cart, name='add_to_cart'),
-    # path('cart/', views.cart_detail, name='cart_detail'),
-    # path('cart/remove/<int:equipment_id>/', views.remove_from_cart, name='remove_from_cart'),
-    # path('cart/clear/', views.clear_cart, name='clear_cart'),
-    # path('checkout/', views.checkout, name='checkout'),
+    path('add-to-cart/<int:equipment_id>/', views.add_to_cart, name='add_to_cart'),
+    path('cart/', views.cart_detail, name='cart_detail'),
+    path('cart/remove/<int:equipment_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/clear/', views.clear_cart, name='clear_cart'),
+    path('checkout/', views.checkout, name='checkout'),
     path('request/<int:equipment_id>/', views.equipment_request, name='equipment_request'),
     path('my-requests/', views.my_requests, name='my_requests'),
     path('manage-requests/', views.manage_requests, name='manage_requests'),
@@ -20,7 +24,11 @@ urlpatterns = [
     path('manage-requests/reject/<int:requisition_id>/', views.reject_request, name='reject_request'),
     path('manage-requests/receive/<int:requisition_id>/', views.receive_request, name='receive_request'),
     path('manage-requests/receive/<int:requisition_id>/', views.receive_request, name='receive_request'),
+    path('manage-requests/bulk/', views.bulk_update_requests, name='bulk_update_requests'),
     path('report/', views.request_report, name='request_report'),
+    path('analytics/', views.analytics_charts, name='analytics_charts'),
+    path('analytics/<str:metric>.json', views.analytics_data, name='analytics_data'),
+    path('system/db-pool.json', views.db_pool_stats, name='db_pool_stats'),
     path('scan/', views.scan_qr, name='scan_qr'),
     path('users/', views.user_list, name='user_list'),
     path('users/add/', views.add_user, name='add_user'),
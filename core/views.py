@@ -1,186 +1,639 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag, url_has_allowed_host_and_scheme
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, etag, require_POST
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Min, PositiveIntegerField, Q, Value, When
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
 import csv
+from functools import wraps
+from itertools import islice
+import hashlib
+from collections import defaultdict
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from datetime import datetime, timedelta
 from django.utils import timezone
+from django.utils.text import Truncator
 from django import forms
 from django.core.paginator import Paginator
-from .models import Equipment, Requisition, Category
-from .forms import RequisitionForm, EquipmentForm, RequisitionFilterForm
+from .models import Equipment, Requisition, Category, DASHBOARD_COUNTS_KEY, DASHBOARD_COUNTS_TIMEOUT, dashboard_user_counts_key, invalidate_dashboard_counts
+from . import analytics
+from .analytics import start_of_day
+from .catalog import acatalog_cached, acatalog_version, bump_catalog_version, catalog_cached, catalog_version
+from .dbpool import pool_stats
+from .forms import CheckoutForm, RequisitionForm, EquipmentForm, EquipmentImportUploadForm, RequisitionFilterForm
+from .importer import IMPORT_COLUMNS, import_equipment as run_equipment_import
+from .qrcodes import LABEL_SHEET_SIZE, QR_FORMATS, equipment_request_url, label_equipment, qr_cache_key, render_label_sheet, render_qr
+from .renditions import rendition_urls
+from .rollups import category_summary, record_requisition_changes, rollup_row
+from .routers import replica_alias, replica_reads
+from .search import asearch_equipment, equipment_search_filter
 
 # Create your views here.
+async def aget_dashboard_counts(user):
+    """
+    Returns the dashboard counters, served from the cache when possible.
+    On a miss all requisition counters come from a single aggregate query;
+    the cache is invalidated by signals in models.py.
+    """
+    user_key = dashboard_user_counts_key(user.pk)
+    cached = await cache.aget_many([DASHBOARD_COUNTS_KEY, user_key])
+    counts = cached.get(DASHBOARD_COUNTS_KEY)
+    user_counts = cached.get(user_key)
+
+    if counts is None:
+        totals = await Requisition.objects.aaggregate(
+            requisition_count=Count('pk'),
+            pending_count=Count('pk', filter=Q(status='PENDING')),
+            my_pending_count=Count('pk', filter=Q(status='PENDING', user=user)),
+        )
+        counts = {
+            'equipment_count': await Equipment.objects.acount(),
+            'requisition_count': totals['requisition_count'],
+            'pending_count': totals['pending_count'],
+        }
+        user_counts = {'my_pending_count': totals['my_pending_count']}
+        await cache.aset_many({DASHBOARD_COUNTS_KEY: counts, user_key: user_counts}, DASHBOARD_COUNTS_TIMEOUT)
+    elif user_counts is None:
+        user_counts = {'my_pending_count': await Requisition.objects.filter(user=user, status='PENDING').acount()}
+        await cache.aset(user_key, user_counts, DASHBOARD_COUNTS_TIMEOUT)
+
+    return {**counts, **user_counts}
+
+async def load_user(request):
+    """
+    Resolves request.user with the async ORM. Templates read request.user
+    synchronously (the auth context processor), which would otherwise
+    query the database from the event loop.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+def async_condition(etag_func):
+    """
+    condition(etag_func=...) for async views. Django's decorator calls
+    etag_func synchronously, where the ORM is not allowed; here etag_func
+    is a coroutine function.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = quote_etag(await etag_func(request, *args, **kwargs))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+# Read-heavy views (dashboard, search_equipment, my_requests) are async: under
+# ASGI a worker keeps serving other requests while these wait on the database.
+
 @login_required
-def dashboard(request):
-    equipment_count = Equipment.objects.count()
-    requisition_count = Requisition.objects.count()
-    pending_count = Requisition.objects.filter(status='PENDING').count()
-    my_pending_count = Requisition.objects.filter(user=request.user, status='PENDING').count()
-    
-    context = {
-        'equipment_count': equipment_count,
-        'requisition_count': requisition_count,
-        'pending_count': pending_count,
-        'my_pending_count': my_pending_count,
-    }
-    return render(request, 'dashboard.html', context)
+async def dashboard(request):
+    user = await load_user(request)
+    return render(request, 'dashboard.html', await aget_dashboard_counts(user))
+
+def changes_aggregates(aggregates):
+    return {'last_modified': Max('updated_at'), **aggregates}
+
+def changes_digest(state, extra):
+    return hashlib.sha1(repr((sorted(state.items()), extra)).encode()).hexdigest()
+
+def changes_etag(queryset, *extra, **aggregates):
+    """
+    ETag for a page built from `queryset`, from a single aggregate query:
+    MAX(updated_at) plus any `aggregates`, and the `extra` values. Deleted
+    rows do not move MAX(updated_at), so callers include something that
+    does change on delete (the catalog version); that is also why these
+    views send no Last-Modified.
+    """
+    return changes_digest(queryset.aggregate(**changes_aggregates(aggregates)), extra)
+
+async def achanges_etag(queryset, *extra, **aggregates):
+    return changes_digest(await queryset.aaggregate(**changes_aggregates(aggregates)), extra)
+
+def catalog_etag(request, *args, **kwargs):
+    # The catalog version also changes on deletes and category edits
+    return changes_etag(Equipment.objects.all(), catalog_version())
+
+async def acatalog_etag(request, *args, **kwargs):
+    return await achanges_etag(Equipment.objects.all(), await acatalog_version())
+
+async def my_requests_etag(request):
+    # Requisitions are only deleted along with their equipment, which
+    # changes the catalog version, or with their user
+    user = await load_user(request)
+    # base.html renders a CSRF token (logout form), the user's name and the
+    # staff navigation; a 304 must not keep a page with stale ones
+    get_token(request)
+    return await achanges_etag(
+        Requisition.objects.filter(user=user),
+        user.pk,
+        user.get_full_name(),
+        user.is_staff,
+        request.META['CSRF_COOKIE'],
+        await acatalog_version(),
+        len(await request.session.aget('cart', [])),
+        # Loans turn overdue (and are highlighted) without being written to:
+        # the next one due changes when that happens
+        next_due=Min('return_date', filter=Q(status='APPROVED', return_date__gte=timezone.now())),
+    )
 
 @login_required
 def equipment_list(request):
-    equipment_list = Equipment.objects.all().order_by('-pk')
-    return render(request, 'equipment_list.html', {'equipment_list': equipment_list})
+    # Rows are loaded on demand by DataTables from equipment_data
+    return render(request, 'equipment_list.html')
+
+# DataTables column index -> model field used for ordering
+EQUIPMENT_DATA_COLUMNS = {
+    0: 'name',
+    1: 'serial_number',
+    2: 'status',
+    3: 'total_quantity',
+    4: 'available_quantity',
+    7: 'category__name',
+}
+EQUIPMENT_DATA_MAX_LENGTH = 100
 
 @login_required
-def search_equipment(request):
-    query = request.GET.get('q', '')
-    page_number = request.GET.get('page', 1)
-    
+@replica_reads
+@condition(etag_func=catalog_etag)
+def equipment_data(request):
+    """
+    Server-side processing endpoint for the equipment DataTable.
+    Filtering, ordering and paging are all done in the database, and pages
+    are cached until the catalog changes (see core.catalog).
+    """
+    try:
+        draw = int(request.GET.get('draw', 0))
+        start = max(int(request.GET.get('start', 0)), 0)
+        length = int(request.GET.get('length', 10))
+    except (ValueError, TypeError):
+        draw, start, length = 0, 0, 10
+    if length <= 0 or length > EQUIPMENT_DATA_MAX_LENGTH:
+        length = EQUIPMENT_DATA_MAX_LENGTH
+
+    query = request.GET.get('search[value]', '').strip()
+    ordering = ['-pk']
+    try:
+        column = EQUIPMENT_DATA_COLUMNS.get(int(request.GET.get('order[0][column]', '')))
+    except (ValueError, TypeError):
+        column = None
+    if column:
+        prefix = '-' if request.GET.get('order[0][dir]') == 'desc' else ''
+        ordering = [prefix + column, '-pk']
+
+    page = catalog_cached(
+        'equipment-data', (query, ordering, start, length),
+        lambda: equipment_data_page(query, ordering, start, length),
+    )
+    return JsonResponse({'draw': draw, **page})
+
+def equipment_data_page(query, ordering, start, length):
+    queryset = Equipment.objects.select_related('category')
+    records_total = queryset.count()
+
     if query:
-        equipment_list = Equipment.objects.filter(
-            Q(name__icontains=query) | 
-            Q(serial_number__icontains=query) |
-            Q(category__name__icontains=query)
-        ).order_by('-pk')
+        queryset = queryset.filter(equipment_search_filter(query))
+        records_filtered = queryset.count()
     else:
-        equipment_list = Equipment.objects.all().order_by('-pk')
-        
-    paginator = Paginator(equipment_list, 8) # 8 items per page
+        records_filtered = records_total
+
+    data = []
+    for equipment in queryset.order_by(*ordering)[start:start + length]:
+        data.append({
+            'id': equipment.id,
+            'name': equipment.name,
+            'serial_number': equipment.serial_number,
+            'status': equipment.status,
+            'status_display': equipment.get_status_display(),
+            'total_quantity': equipment.total_quantity,
+            'available_quantity': equipment.available_quantity,
+            'image_url': equipment.image.url if equipment.image else None,
+            'renditions': equipment.renditions,
+            'description': Truncator(equipment.description).chars(30),
+            'category': equipment.category.name,
+        })
+
+    return {
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': data,
+    }
+
+SEARCH_PAGE_SIZE = 8
+SEARCH_MAX_LIMIT = 50
+SEARCH_RESULT_FIELDS = ('id', 'name', 'serial_number', 'available_quantity', 'image', 'status', 'category__name')
+
+def with_renditions(rows):
+    """
+    Adds thumbnail / WebP URLs to search result dicts so clients rarely
+    need to download the original upload, which is the fallback for
+    missing renditions.
+    """
+    rows = list(rows)
+    for row in rows:
+        row['image_url'] = default_storage.url(row['image']) if row['image'] else None
+        row['renditions'] = rendition_urls(row['image'])
+    return rows
+
+@login_required
+@replica_reads
+@async_condition(acatalog_etag)
+async def search_equipment(request):
+    query = request.GET.get('q', '')
+
+    if request.GET.get('mode') == 'cursor':
+        return await search_equipment_cursor(request, query)
+
+    page_number = request.GET.get('page', 1)
+    data = await acatalog_cached('search', (query, page_number), lambda: search_equipment_page(query, page_number))
+    return JsonResponse(data)
+
+async def search_equipment_page(query, page_number):
+    equipment_list = await asearch_equipment(Equipment.objects.all(), query)
+    paginator = Paginator(equipment_list, SEARCH_PAGE_SIZE) # 8 items per page
+    # Paginator counts synchronously; count up front with the async ORM
+    paginator.count = await equipment_list.acount()
     page_obj = paginator.get_page(page_number)
     
-    results = list(page_obj.object_list.values('id', 'name', 'serial_number', 'available_quantity', 'image', 'status', 'category__name'))
+    results = with_renditions([row async for row in page_obj.object_list.values(*SEARCH_RESULT_FIELDS)])
     
-    data = {
+    return {
         'results': results,
         'has_next': page_obj.has_next(),
         'has_previous': page_obj.has_previous(),
         'num_pages': paginator.num_pages,
         'current_page': page_obj.number,
     }
-        
+
+async def search_equipment_cursor(request, query):
+    """
+    Infinite-scroll variant of search_equipment (?mode=cursor): returns a
+    next_cursor instead of page numbers, so no COUNT(*) is needed.
+    Unranked results are paged by keyset on pk; ranked full-text results
+    have no stable key and are paged by offset.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_LIMIT)
+    except (ValueError, TypeError):
+        limit = SEARCH_PAGE_SIZE
+    cursor = request.GET.get('cursor')
+    data = await acatalog_cached(
+        'search-cursor', (query, cursor, limit),
+        lambda: search_equipment_cursor_page(query, cursor, limit),
+    )
     return JsonResponse(data)
 
-# @login_required
-# def add_to_cart(request, equipment_id):
-#     cart = request.session.get('cart', [])
-#     if equipment_id not in cart:
-#         cart.append(equipment_id)
-#         request.session['cart'] = cart
-#     return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
-
-# @login_required
-# def remove_from_cart(request, equipment_id):
-#     cart = request.session.get('cart', [])
-#     if equipment_id in cart:
-#         cart.remove(equipment_id)
-#         request.session['cart'] = cart
-#     return redirect('cart_detail')
-
-# @login_required
-# def clear_cart(request):
-#     request.session['cart'] = []
-#     return redirect('cart_detail')
-
-# @login_required
-# def cart_detail(request):
-#     cart = request.session.get('cart', [])
-#     equipment_in_cart = Equipment.objects.filter(id__in=cart)
-#     return render(request, 'cart_detail.html', {'equipment_list': equipment_in_cart})
-
-# @login_required
-# def checkout(request):
-#     cart = request.session.get('cart', [])
-#     if not cart:
-#         return redirect('dashboard')
-
-#     if request.method == 'POST':
-#         return_date = request.POST.get('return_date') # Global return date for simplicity
-        
-#         for equipment_id in cart:
-#             equipment = get_object_or_404(Equipment, pk=equipment_id)
-            
-#             # Get quantity from form
-#             try:
-#                 request_qty = int(request.POST.get(f'quantity_{equipment_id}', 1))
-#             except (ValueError, TypeError):
-#                 request_qty = 1
-            
-#             # Validate max quantity
-#             if request_qty > equipment.available_quantity:
-#                  request_qty = equipment.available_quantity # Cap at available? Or skip? Let's cap.
-
-#             if request_qty > 0:
-#                 # Create Requisition
-#                 Requisition.objects.create(
-#                     user=request.user,
-#                     equipment=equipment,
-#                     quantity=request_qty,
-#                     return_date=return_date if return_date else None,
-#                     status='PENDING'
-#                 )
-                
-#                 # Deduct stock immediately
-#                 equipment.available_quantity -= request_qty
-#                 equipment.save()
-#             else:
-#                  # Skip invalid qty
-#                  pass
-                
-#         # Clear cart
-#         request.session['cart'] = []
-#         return redirect('my_requests')
-        
-#     return redirect('cart_detail')
+async def search_equipment_cursor_page(query, cursor, limit):
+    equipment_list = await asearch_equipment(Equipment.objects.all(), query)
+    ranked = 'rank' in equipment_list.query.annotations
+    cursor = decode_cursor(cursor, 1)
+    offset = 0
+    if cursor:
+        try:
+            position = int(cursor[0])
+        except ValueError:
+            position = None
+        if position is not None and ranked:
+            offset = max(position, 0)
+        elif position is not None:
+            equipment_list = equipment_list.filter(pk__lt=position)
+
+    rows = [row async for row in equipment_list.values(*SEARCH_RESULT_FIELDS)[offset:offset + limit + 1]]
+    results, has_next = with_renditions(rows[:limit]), len(rows) > limit
+
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_cursor(offset + limit if ranked else results[-1]['id'])
+
+    return {
+        'results': results,
+        'has_next': has_next,
+        'next_cursor': next_cursor,
+    }
+
+@login_required
+@require_POST
+def add_to_cart(request, equipment_id):
+    cart = request.session.get('cart', [])
+    if equipment_id not in cart:
+        cart.append(equipment_id)
+        request.session['cart'] = cart
+    # Back to the page the item was added from, if it is one of ours
+    referer = request.META.get('HTTP_REFERER')
+    if not url_has_allowed_host_and_scheme(referer, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        referer = 'dashboard'
+    return redirect(referer)
+
+@login_required
+@require_POST
+def remove_from_cart(request, equipment_id):
+    cart = request.session.get('cart', [])
+    if equipment_id in cart:
+        cart.remove(equipment_id)
+        request.session['cart'] = cart
+    return redirect('cart_detail')
+
+@login_required
+@require_POST
+def clear_cart(request):
+    request.session['cart'] = []
+    return redirect('cart_detail')
+
+def cart_equipment(cart):
+    return list(Equipment.objects.select_related('category').filter(id__in=cart).order_by('name'))
+
+@login_required
+def cart_detail(request):
+    cart = request.session.get('cart', [])
+    return render(request, 'cart_detail.html', {'equipment_list': cart_equipment(cart), 'form': CheckoutForm()})
+
+@login_required
+@require_POST
+def checkout(request):
+    """
+    Requests everything in the cart at once. All items are reserved with one
+    conditional UPDATE and all requisitions are written with one INSERT, in a
+    single transaction: either the whole cart goes through or nothing does.
+    """
+    cart = request.session.get('cart', [])
+    if not cart:
+        return redirect('dashboard')
+
+    equipment_list = cart_equipment(cart)
+    form = CheckoutForm(request.POST)
+    quantities = {}
+    has_errors = not form.is_valid()
+    for equipment in equipment_list:
+        value = request.POST.get(f'quantity_{equipment.pk}', '')
+        equipment.requested_quantity = value
+        equipment.cart_error = ''
+        try:
+            quantity = int(value)
+        except ValueError:
+            quantity = 0
+        if quantity < 1:
+            equipment.cart_error = 'Enter a quantity of at least 1.'
+            has_errors = True
+        else:
+            quantities[equipment.pk] = quantity
+
+    if not has_errors:
+        with transaction.atomic():
+            if reserve_stock_many(quantities):
+                requisitions = [
+                    Requisition(
+                        user=request.user,
+                        equipment_id=equipment_id,
+                        quantity=quantity,
+                        reason=form.cleaned_data['reason'],
+                        return_date=form.cleaned_data['return_date'],
+                        status='PENDING',
+                    )
+                    for equipment_id, quantity in quantities.items()
+                ]
+                Requisition.objects.bulk_create(requisitions)
+                # bulk_create skips the post_save receivers that keep the dashboard counters and rollups fresh
+                invalidate_dashboard_counts([request.user.pk])
+                record_requisition_changes((None, rollup_row(requisition)) for requisition in requisitions)
+                request.session['cart'] = []
+                return redirect('my_requests')
+
+        # Some item ran short; nothing was reserved, so show what is left now
+        available = dict(Equipment.objects.filter(pk__in=quantities).values_list('pk', 'available_quantity'))
+        for equipment in equipment_list:
+            equipment.available_quantity = available.get(equipment.pk, 0)
+            if quantities.get(equipment.pk, 0) > equipment.available_quantity:
+                equipment.cart_error = f'Only {equipment.available_quantity} items available.'
+
+    return render(request, 'cart_detail.html', {'equipment_list': equipment_list, 'form': form})
+
+def reserve_stock(equipment_id, quantity):
+    """
+    Atomically takes `quantity` units out of stock with a single conditional
+    UPDATE. Returns False (and changes nothing) if not enough are available.
+    """
+    updated = Equipment.objects.filter(
+        pk=equipment_id,
+        available_quantity__gte=quantity,
+    ).update(available_quantity=F('available_quantity') - quantity, updated_at=timezone.now())
+    if updated:
+        # update() sends no post_save
+        bump_catalog_version()
+    return updated == 1
+
+def release_stock(equipment_id, quantity):
+    """
+    Atomically puts `quantity` units back into stock.
+    """
+    Equipment.objects.filter(pk=equipment_id).update(
+        available_quantity=F('available_quantity') + quantity, updated_at=timezone.now(),
+    )
+    bump_catalog_version()
+
+def release_stock_many(quantities):
+    """
+    Puts stock back for several equipment at once; `quantities` maps
+    equipment id -> units. One UPDATE with a CASE per equipment.
+    """
+    if not quantities:
+        return
+    Equipment.objects.filter(pk__in=quantities.keys()).update(
+        available_quantity=F('available_quantity') + Case(
+            *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+            output_field=PositiveIntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    bump_catalog_version()
+
+def reserve_stock_many(quantities):
+    """
+    Takes stock for several equipment at once; `quantities` maps equipment
+    id -> units. One conditional UPDATE with a CASE per equipment. Returns
+    False (and changes nothing) if any of them is short.
+    """
+    if not quantities:
+        return True
+    requested = Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=PositiveIntegerField(),
+    )
+    with transaction.atomic():
+        updated = Equipment.objects.filter(
+            pk__in=quantities.keys(),
+            available_quantity__gte=requested,
+        ).update(available_quantity=F('available_quantity') - requested, updated_at=timezone.now())
+        if updated != len(quantities):
+            transaction.set_rollback(True)
+            return False
+    bump_catalog_version()
+    return True
 
 @login_required
 def equipment_request(request, equipment_id):
-    equipment = get_object_or_404(Equipment, pk=equipment_id)
+    equipment = catalog_cached('equipment', (equipment_id,), lambda: Equipment.objects.filter(pk=equipment_id).first())
+    if equipment is None:
+        raise Http404('No Equipment matches the given query.')
     if request.method == 'POST':
         form = RequisitionForm(request.POST)
         if form.is_valid():
             requisition = form.save(commit=False)
-            
-            # Check availability
-            request_qty = requisition.quantity
-            if request_qty > equipment.available_quantity:
-                # Add error to form
-                form.add_error('quantity', f'Only {equipment.available_quantity} items available.')
-                return render(request, 'request_form.html', {'form': form, 'equipment': equipment})
-                
-            # Deduct from available quantity
-            equipment.available_quantity -= request_qty
-            equipment.save()
-            
             requisition.user = request.user
             requisition.equipment = equipment
-            requisition.save()
-            return redirect('my_requests')
+
+            # Deduct from available quantity; the check and the write are one UPDATE,
+            # so concurrent requests cannot both take the last units
+            with transaction.atomic():
+                if reserve_stock(equipment.pk, requisition.quantity):
+                    requisition.save()
+                    return redirect('my_requests')
+
+            equipment.refresh_from_db(fields=['available_quantity'])
+            form.add_error('quantity', f'Only {equipment.available_quantity} items available.')
     else:
         form = RequisitionForm()
     
-    return render(request, 'request_form.html', {'form': form, 'equipment': equipment})
+    image_card = catalog_cached(
+        'equipment-image', (equipment.pk,),
+        lambda: render_to_string('includes/equipment_image.html', {'equipment': equipment}),
+    )
+    return render(request, 'request_form.html', {'form': form, 'equipment': equipment, 'image_card': image_card})
+
+REQUISITION_PAGE_SIZE = 50
+# Related rows rendered by the requisition list templates; joined up front to avoid N+1 queries
+REQUISITION_LIST_RELATED = ('user', 'equipment', 'approved_by', 'rejected_by', 'received_by')
+
+def encode_cursor(*values):
+    raw = '|'.join(str(value) for value in values)
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, count):
+    """
+    Returns the list of raw cursor values, or None if the cursor is
+    missing or malformed (which simply restarts from the first page).
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = urlsafe_b64decode(padded.encode()).decode().split('|')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if len(values) != count:
+        return None
+    return values
+
+def look_ahead(queryset, size):
+    return queryset[:size + 1]
+
+def split_look_ahead(rows, size):
+    return rows[:size], len(rows) > size
+
+def keyset_page(queryset, size=REQUISITION_PAGE_SIZE):
+    """
+    Fetches one page plus a single look-ahead row, so we know whether a
+    next page exists without running COUNT(*) on the table.
+    """
+    return split_look_ahead(list(look_ahead(queryset, size)), size)
+
+async def akeyset_page(queryset, size=REQUISITION_PAGE_SIZE):
+    return split_look_ahead([row async for row in look_ahead(queryset, size)], size)
+
+def filter_requisition_status(request, requisitions, data=None):
+    status = (request.GET if data is None else data).get('status', '')
+    if status in dict(Requisition.STATUS_CHOICES):
+        return requisitions.filter(status=status), status
+    return requisitions, ''
 
 @login_required
-def my_requests(request):
-    requisitions = Requisition.objects.filter(user=request.user).order_by('-date')
-    return render(request, 'my_requests.html', {'requisitions': requisitions, 'now': timezone.now()})
+@cache_control(private=True, no_cache=True)
+@replica_reads
+@async_condition(my_requests_etag)
+async def my_requests(request):
+    user = await load_user(request)
+    requisitions = Requisition.objects.filter(user=user).select_related(*REQUISITION_LIST_RELATED)
+    requisitions, status = filter_requisition_status(request, requisitions)
+
+    # Keyset on (date, id): newest first, id breaks ties on identical dates
+    cursor = decode_cursor(request.GET.get('cursor'), 2)
+    if cursor:
+        try:
+            after_date = datetime.fromisoformat(cursor[0])
+            after_id = int(cursor[1])
+        except ValueError:
+            pass
+        else:
+            requisitions = requisitions.filter(
+                Q(date__lt=after_date) | Q(date=after_date, id__lt=after_id)
+            )
+
+    page, has_next = await akeyset_page(requisitions.order_by('-date', '-id'))
+    next_cursor = encode_cursor(page[-1].date.isoformat(), page[-1].id) if has_next else None
+
+    return render(request, 'my_requests.html', {
+        'requisitions': page,
+        'now': timezone.now(),
+        'status': status,
+        'status_choices': Requisition.STATUS_CHOICES,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+    })
 
 @login_required
+@replica_reads
 def manage_requests(request):
     if not request.user.is_staff:
         return redirect('dashboard')
-    requisitions = Requisition.objects.all().order_by('-id')
-    return render(request, 'manage_requests.html', {'requisitions': requisitions})
+    requisitions = Requisition.objects.select_related(*REQUISITION_LIST_RELATED)
+    requisitions, status = filter_requisition_status(request, requisitions)
+
+    # Keyset on id: newest first
+    cursor = decode_cursor(request.GET.get('cursor'), 1)
+    if cursor:
+        try:
+            requisitions = requisitions.filter(id__lt=int(cursor[0]))
+        except ValueError:
+            pass
+
+    page, has_next = keyset_page(requisitions.order_by('-id'))
+    next_cursor = encode_cursor(page[-1].id) if has_next else None
+
+    return render(request, 'manage_requests.html', {
+        'requisitions': page,
+        'status': status,
+        'status_choices': Requisition.STATUS_CHOICES,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+        'has_more_pages': has_next or cursor is not None,
+    })
 
 @login_required
 def approve_request(request, requisition_id):
     if not request.user.is_staff:
         return redirect('dashboard')
     
-    requisition = get_object_or_404(Requisition, pk=requisition_id)
-    requisition.status = 'APPROVED'
-    requisition.approve_date = timezone.now()
-    requisition.approved_by = request.user
-    requisition.save()
+    with transaction.atomic():
+        requisition = get_object_or_404(Requisition.objects.select_for_update(), pk=requisition_id)
+        # Only process if currently Pending
+        if requisition.status == 'PENDING':
+            requisition.status = 'APPROVED'
+            requisition.approve_date = timezone.now()
+            requisition.approved_by = request.user
+            requisition.save()
     return redirect('manage_requests')
 
 @login_required
@@ -188,21 +641,24 @@ def reject_request(request, requisition_id):
     if not request.user.is_staff:
         return redirect('dashboard')
         
-    requisition = get_object_or_404(Requisition, pk=requisition_id)
-    
     if request.method == 'POST':
         reason = request.POST.get('reject_reason', '')
         
-        # Restore quantity if rejected (Actually we deducted on Request, so we MUST restore on Reject)
-        equipment = requisition.equipment
-        equipment.available_quantity += requisition.quantity
-        equipment.save()
-        
-        requisition.status = 'REJECTED'
-        requisition.reject_date = timezone.now()
-        requisition.reject_reason = reason
-        requisition.rejected_by = request.user
-        requisition.save()
+        # The row lock makes the status check and the stock restore happen once,
+        # even if the reject form is submitted twice
+        with transaction.atomic():
+            requisition = get_object_or_404(Requisition.objects.select_for_update(), pk=requisition_id)
+            if requisition.status == 'PENDING':
+                requisition.status = 'REJECTED'
+                requisition.reject_date = timezone.now()
+                requisition.reject_reason = reason
+                requisition.rejected_by = request.user
+                requisition.save()
+
+                # Restore quantity if rejected (Actually we deducted on Request, so we MUST restore on Reject)
+                release_stock(requisition.equipment_id, requisition.quantity)
+    else:
+        get_object_or_404(Requisition, pk=requisition_id)
         
     return redirect('manage_requests')
 
@@ -211,77 +667,337 @@ def receive_request(request, requisition_id):
     if not request.user.is_staff:
         return redirect('dashboard')
         
-    requisition = get_object_or_404(Requisition, pk=requisition_id)
-    
-    # Only process if currently Approved
-    if requisition.status == 'APPROVED':
-        requisition.status = 'RETURNED'
-        requisition.actual_return_date = timezone.now()
-        requisition.received_by = request.user
-        requisition.save()
+    with transaction.atomic():
+        requisition = get_object_or_404(Requisition.objects.select_for_update(), pk=requisition_id)
         
-        # Restore stock
-        equipment = requisition.equipment
-        equipment.available_quantity += requisition.quantity
-        equipment.save()
+        # Only process if currently Approved
+        if requisition.status == 'APPROVED':
+            requisition.status = 'RETURNED'
+            requisition.actual_return_date = timezone.now()
+            requisition.received_by = request.user
+            requisition.save()
+            
+            # Restore stock
+            release_stock(requisition.equipment_id, requisition.quantity)
         
     return redirect('manage_requests')
 
+BULK_ACTIONS = {
+    # action -> (status the requisitions must currently have, whether stock goes back)
+    'approve': ('PENDING', False),
+    'reject': ('PENDING', True),
+    'receive': ('APPROVED', True),
+}
+
+@login_required
+@require_POST
+def bulk_update_requests(request):
+    """
+    Approves, rejects or receives many requisitions in one transaction:
+    the checked ids, or with scope=filter every requisition matching the
+    posted status filter, not just the page on screen. Requisitions not in
+    the expected status (e.g. already handled by another approver) are
+    skipped.
+    """
+    if not request.user.is_staff:
+        return redirect('dashboard')
+
+    action = request.POST.get('action')
+    if action not in BULK_ACTIONS:
+        return redirect('manage_requests')
+    expected_status, restores_stock = BULK_ACTIONS[action]
+
+    selected = Requisition.objects.filter(status=expected_status)
+    if request.POST.get('scope') == 'filter':
+        selected, _ = filter_requisition_status(request, selected, request.POST)
+    else:
+        ids = []
+        for pk in request.POST.getlist('ids'):
+            try:
+                ids.append(int(pk))
+            except ValueError:
+                continue
+        selected = selected.filter(pk__in=ids)
+    now = timezone.now()
+
+    with transaction.atomic():
+        requisitions = list(
+            selected.select_for_update()
+            .only('pk', 'user_id', 'equipment_id', 'quantity', 'status', 'date')
+        )
+        if not requisitions:
+            return redirect('manage_requests')
+
+        if action == 'approve':
+            fields = ['status', 'approve_date', 'approved_by']
+            for requisition in requisitions:
+                requisition.status = 'APPROVED'
+                requisition.approve_date = now
+                requisition.approved_by = request.user
+        elif action == 'reject':
+            fields = ['status', 'reject_date', 'reject_reason', 'rejected_by']
+            reason = request.POST.get('reject_reason', '')
+            for requisition in requisitions:
+                requisition.status = 'REJECTED'
+                requisition.reject_date = now
+                requisition.reject_reason = reason
+                requisition.rejected_by = request.user
+        else:
+            fields = ['status', 'actual_return_date', 'received_by']
+            for requisition in requisitions:
+                requisition.status = 'RETURNED'
+                requisition.actual_return_date = now
+                requisition.received_by = request.user
+
+        # bulk_update does not apply auto_now
+        for requisition in requisitions:
+            requisition.updated_at = now
+        Requisition.objects.bulk_update(requisitions, fields + ['updated_at'], batch_size=500)
+        record_requisition_changes(
+            ((requisition.date, requisition.equipment_id, expected_status, requisition.quantity), rollup_row(requisition))
+            for requisition in requisitions
+        )
+
+        if restores_stock:
+            returned = defaultdict(int)
+            for requisition in requisitions:
+                returned[requisition.equipment_id] += requisition.quantity
+            release_stock_many(returned)
+
+    # bulk_update sends no post_save, so the dashboard cache and rollups are updated by hand
+    invalidate_dashboard_counts(requisition.user_id for requisition in requisitions)
+    return redirect('manage_requests')
+
+QR_MAX_AGE = 60 * 60 * 24
+
+def equipment_qr_etag(request, equipment_id, fmt):
+    data = equipment_request_url(request.build_absolute_uri('/'), equipment_id)
+    return qr_cache_key(data, fmt)
+
+@login_required
+@etag(equipment_qr_etag)
+def equipment_qr(request, equipment_id, fmt):
+    """
+    QR code (PNG or SVG) linking to the request page of one equipment.
+    """
+    if fmt not in QR_FORMATS or not Equipment.objects.filter(pk=equipment_id).exists():
+        raise Http404('No Equipment matches the given query.')
+    data = equipment_request_url(request.build_absolute_uri('/'), equipment_id)
+    response = HttpResponse(render_qr(data, fmt), content_type=QR_FORMATS[fmt])
+    patch_cache_control(response, private=True, max_age=QR_MAX_AGE)
+    return response
+
+@login_required
+def equipment_labels(request):
+    """
+    Printable QR label sheet for the equipment matching the filters
+    (q, category, status), LABEL_SHEET_SIZE labels per page so a cold
+    render stays within the worker timeout.
+    """
+    if not request.user.is_staff:
+        return redirect('equipment_list')
+
+    equipment_list = label_equipment(
+        query=request.GET.get('q', '').strip(),
+        category=request.GET.get('category'),
+        status=request.GET.get('status'),
+    )
+    paginator = Paginator(equipment_list, LABEL_SHEET_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
+    params = request.GET.copy()
+    params.pop('page', None)
+    return HttpResponse(render_label_sheet(
+        equipment_list[page.start_index() - 1:page.end_index()] if paginator.count else equipment_list.none(),
+        request.build_absolute_uri('/'),
+        page=page,
+        query_string=params.urlencode(),
+    ))
+
 @login_required
 def scan_qr(request):
     if not request.user.is_staff:
         return redirect('dashboard')
     return render(request, 'scan_qr.html')
 
+class Echo:
+    """
+    Pseudo-buffer for csv.writer: write() hands the formatted line
+    straight back instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+REPORT_CSV_HEADER = ['ID', 'Equipment', 'Quantity', 'User', 'Request Date', 'Approve Date', 'Reject Date', 'Returned Date', 'Status']
+REPORT_CSV_CHUNK_SIZE = 2000
+
+def stream_report_csv(requisitions):
+    """
+    Yields the report CSV line by line. Rows come from a server-side cursor
+    over values_list(), so joins are resolved in SQL and no model instances
+    are built; memory stays flat regardless of the number of rows.
+    """
+    writer = csv.writer(Echo())
+    status_labels = dict(Requisition.STATUS_CHOICES)
+
+    def format_date(value):
+        return value.strftime('%Y-%m-%d %H:%M') if value else '-'
+
+    yield writer.writerow(REPORT_CSV_HEADER)
+
+    rows = requisitions.values_list(
+        'pk', 'equipment__name', 'quantity', 'user__username',
+        'date', 'approve_date', 'reject_date', 'actual_return_date', 'status',
+    ).iterator(chunk_size=REPORT_CSV_CHUNK_SIZE)
+
+    for pk, equipment_name, quantity, username, date, approve_date, reject_date, returned_date, status in rows:
+        yield writer.writerow([
+            pk,
+            equipment_name,
+            quantity,
+            username,
+            format_date(date),
+            format_date(approve_date),
+            format_date(reject_date),
+            format_date(returned_date),
+            status_labels.get(status, status),
+        ])
+
+async def astream_report_csv(requisitions):
+    """
+    stream_report_csv() for ASGI. Django buffers a sync iterator completely
+    before sending it under ASGI; this one hands over REPORT_CSV_CHUNK_SIZE
+    lines at a time, read in the request's database thread.
+    """
+    lines = stream_report_csv(requisitions)
+    next_lines = sync_to_async(lambda: ''.join(islice(lines, REPORT_CSV_CHUNK_SIZE)))
+    try:
+        while chunk := await next_lines():
+            yield chunk
+    finally:
+        # Closes the server-side cursor if the client went away
+        await sync_to_async(lines.close)()
+
+REPORT_DETAIL_LIMIT = 1000
+
 @login_required
+@replica_reads
 def request_report(request):
     if not request.user.is_staff:
         return redirect('dashboard')
         
     form = RequisitionFilterForm(request.GET)
     requisitions = None
+    summary = None
+    truncated = False
     
     # Check if any filter parameters are present (even if empty strings)
     # This implies the user clicked "Filter"
     if request.GET:
         if form.is_valid():
-            requisitions = Requisition.objects.all().order_by('-date')
+            requisitions = Requisition.objects.select_related('equipment', 'user').order_by('-date')
             
             start_date = form.cleaned_data.get('start_date')
             end_date = form.cleaned_data.get('end_date')
             category = form.cleaned_data.get('category')
             
+            # Compare against day boundaries rather than date__date, so the
+            # filter stays a range on the indexed column
             if start_date:
-                requisitions = requisitions.filter(date__date__gte=start_date)
+                requisitions = requisitions.filter(date__gte=start_of_day(start_date))
             if end_date:
-                requisitions = requisitions.filter(date__date__lte=end_date)
+                requisitions = requisitions.filter(date__lt=start_of_day(end_date + timedelta(days=1)))
             if category:
                 requisitions = requisitions.filter(equipment__category=category)
                 
             # CSV Export
             if request.GET.get('export') == 'csv':
-                response = HttpResponse(content_type='text/csv')
+                # Rows are read while the response streams, after this view
+                # (and its replica_reads) has returned
+                requisitions = requisitions.using(replica_alias())
+                rows = astream_report_csv(requisitions) if isinstance(request, ASGIRequest) else stream_report_csv(requisitions)
+                response = StreamingHttpResponse(rows, content_type='text/csv')
                 response['Content-Disposition'] = 'attachment; filename="requisition_report.csv"'
-                
-                writer = csv.writer(response)
-                writer.writerow(['ID', 'Equipment', 'Quantity', 'User', 'Request Date', 'Approve Date', 'Reject Date', 'Returned Date', 'Status'])
-                
-                for req in requisitions:
-                    writer.writerow([
-                        req.pk,
-                        req.equipment.name,
-                        req.quantity,
-                        req.user.username,
-                        req.date.strftime('%Y-%m-%d %H:%M'),
-                        req.approve_date.strftime('%Y-%m-%d %H:%M') if req.approve_date else '-',
-                        req.reject_date.strftime('%Y-%m-%d %H:%M') if req.reject_date else '-',
-                        req.actual_return_date.strftime('%Y-%m-%d %H:%M') if req.actual_return_date else '-',
-                        req.get_status_display()
-                    ])
-                
                 return response
-            
-    return render(request, 'request_report.html', {'requisitions': requisitions, 'form': form})
+
+            # Totals come from the daily rollups, so long ranges stay cheap;
+            # the detail table only shows the most recent rows
+            summary = category_summary(start_date, end_date, category)
+            requisitions = list(requisitions[:REPORT_DETAIL_LIMIT + 1])
+            truncated = len(requisitions) > REPORT_DETAIL_LIMIT
+            requisitions = requisitions[:REPORT_DETAIL_LIMIT]
+
+    return render(request, 'request_report.html', {
+        'requisitions': requisitions,
+        'summary': summary,
+        'truncated': truncated,
+        'detail_limit': REPORT_DETAIL_LIMIT,
+        'form': form,
+    })
+
+def analytics_range(request):
+    """
+    The date range and category of an analytics request; defaults to the
+    last ANALYTICS_DEFAULT_DAYS days over all categories.
+    """
+    form = RequisitionFilterForm(request.GET)
+    cleaned = form.cleaned_data if form.is_valid() else {}
+    end_date = cleaned.get('end_date') or timezone.localdate()
+    start_date = cleaned.get('start_date') or end_date - timedelta(days=analytics.ANALYTICS_DEFAULT_DAYS)
+    return start_date, end_date, cleaned.get('category')
+
+ANALYTICS_METRICS = {
+    'utilization': analytics.equipment_utilization,
+    'turnaround': analytics.turnaround,
+    'late-returns': analytics.late_returns,
+}
+
+@login_required
+@replica_reads
+def analytics_data(request, metric):
+    """
+    JSON for one chart on the analytics page. Results are cached briefly,
+    so re-drawing a chart does not re-run the aggregation.
+    """
+    if not request.user.is_staff:
+        return redirect('dashboard')
+    if metric not in ANALYTICS_METRICS:
+        raise Http404
+
+    start_date, end_date, category = analytics_range(request)
+    key = f'analytics:{metric}:{start_date}:{end_date}:{category.pk if category else ""}'
+    results = cache.get(key)
+    if results is None:
+        results = ANALYTICS_METRICS[metric](start_date, end_date, category)
+        cache.set(key, results, analytics.ANALYTICS_TIMEOUT)
+
+    return JsonResponse({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'results': results,
+    })
+
+@login_required
+def db_pool_stats(request):
+    """
+    Database connection pool counters for the worker process that serves
+    this request.
+    """
+    if not request.user.is_staff:
+        return redirect('dashboard')
+    return JsonResponse(pool_stats())
+
+@login_required
+def analytics_charts(request):
+    if not request.user.is_staff:
+        return redirect('dashboard')
+
+    start_date, end_date, category = analytics_range(request)
+    form = RequisitionFilterForm(initial={'start_date': start_date, 'end_date': end_date, 'category': category})
+    return render(request, 'charts.html', {
+        'form': form,
+        'query': request.GET.urlencode(),
+        'overdue_count': analytics.overdue_count(category),
+    })
 
 @login_required
 def add_equipment(request):
@@ -298,6 +1014,33 @@ def add_equipment(request):
     
     return render(request, 'add_equipment.html', {'form': form})
 
+IMPORT_ERRORS_SHOWN = 500
+
+@login_required
+def import_equipment(request):
+    """
+    Bulk-creates equipment from an uploaded CSV or XLSX file and lists the
+    rows that could not be imported.
+    """
+    if not request.user.is_staff:
+        return redirect('equipment_list')
+
+    result = None
+    if request.method == 'POST':
+        form = EquipmentImportUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            result = run_equipment_import(upload.file, upload.name)
+    else:
+        form = EquipmentImportUploadForm()
+
+    return render(request, 'import_equipment.html', {
+        'form': form,
+        'result': result,
+        'errors': result.errors[:IMPORT_ERRORS_SHOWN] if result else [],
+        'columns': IMPORT_COLUMNS,
+    })
+
 @login_required
 def edit_equipment(request, equipment_id):
     if not request.user.is_staff:
@@ -343,6 +1086,7 @@ except Exception as e:
 
 
 @login_required
+@replica_reads
 def user_list(request):
     if not request.user.is_staff:
         return redirect('dashboard')
@@ -0,0 +1,84 @@
+// QR scanner for scan_qr.html, using the browser's built-in BarcodeDetector
+// and camera: no third-party script, so it works on a LAN without internet.
+// Browsers without BarcodeDetector get the manual entry form only.
+(function() {
+  "use strict";
+
+  var video = document.getElementById('scanner-video');
+  var status = document.getElementById('scanner-status');
+  var manualForm = document.getElementById('manual-entry');
+  var requestUrl = manualForm.getAttribute('data-request-url');
+
+  function open(code) {
+    code = code.trim();
+    if (/^\d+$/.test(code)) {
+      window.location.href = requestUrl.replace(/0\/$/, code + '/');
+      return;
+    }
+    var url;
+    try {
+      url = new URL(code, window.location.href);
+    } catch (e) {
+      status.textContent = 'Not an equipment code: ' + code;
+      return;
+    }
+    if (url.origin !== window.location.origin) {
+      status.textContent = 'This code points to another site: ' + url.href;
+      return;
+    }
+    window.location.href = url.href;
+  }
+
+  manualForm.addEventListener('submit', function(e) {
+    e.preventDefault();
+    open(manualForm.elements.code.value);
+  });
+
+  if (!('BarcodeDetector' in window) || !navigator.mediaDevices) {
+    status.textContent = 'This browser cannot scan QR codes. Enter the equipment ID or link below.';
+    return;
+  }
+
+  var detector;
+  try {
+    detector = new BarcodeDetector({formats: ['qr_code']});
+  } catch (e) {
+    // BarcodeDetector without QR support
+    status.textContent = 'This browser cannot scan QR codes. Enter the equipment ID or link below.';
+    return;
+  }
+  var stream = null;
+
+  function stop() {
+    if (stream) {
+      stream.getTracks().forEach(function(track) { track.stop(); });
+    }
+  }
+
+  function scan() {
+    detector.detect(video).then(function(codes) {
+      if (codes.length) {
+        stop();
+        open(codes[0].rawValue);
+      } else {
+        window.setTimeout(scan, 100);
+      }
+    }).catch(function() {
+      window.setTimeout(scan, 250);
+    });
+  }
+
+  navigator.mediaDevices.getUserMedia({video: {facingMode: 'environment'}}).then(function(s) {
+    stream = s;
+    video.srcObject = stream;
+    video.classList.remove('d-none');
+    return video.play();
+  }).then(function() {
+    status.textContent = 'Point your camera at the QR code to manage equipment.';
+    scan();
+  }).catch(function(error) {
+    status.textContent = 'Camera unavailable (' + error.name + '). Enter the equipment ID or link below.';
+  });
+
+  window.addEventListener('pagehide', stop);
+})();